@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Compare two benchmark results written by `run.py --output`.
+
+Usage::
+
+    python benchmarks/compare.py before.json after.json
+
+Exits with status 1 if the median latency of any scenario grew more than
+the threshold, or if a scenario runs more queries per request.
+"""
+
+import argparse
+import json
+import sys
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report['meta'], dict(((r['rows'], r['scenario']), r)
+                                for r in report['results'])
+
+
+def change(before, after):
+    if not before or after is None:
+        return None
+    return (after - before) / before
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='allowed median latency increase (default: 0.1)')
+    args = parser.parse_args()
+
+    meta_before, before = load(args.before)
+    meta_after, after = load(args.after)
+
+    print('{} -> {}'.format(meta_before.get('commit'),
+                            meta_after.get('commit')))
+    row_format = '{:>9} {:<20} {:>9} {:>9} {:>8} {:>9} {:>9}  {}'
+    print(row_format.format('rows', 'scenario', 'p50 ms', 'p50 ms', 'change',
+                            'queries', 'queries', ''))
+    print(row_format.format('', '', 'before', 'after', '', 'before',
+                            'after', ''))
+
+    regressions = 0
+    for key in sorted(set(before) & set(after)):
+        old, new = before[key], after[key]
+        delta = change(old['p50_ms'], new['p50_ms'])
+
+        flags = []
+        if delta is not None and delta > args.threshold:
+            flags.append('slower')
+        if (old['queries'] or 0) < (new['queries'] or 0):
+            flags.append('more queries')
+        if old['status'] != new['status']:
+            flags.append('status {}'.format(new['status']))
+        regressions += bool(flags)
+
+        print(row_format.format(
+            key[0], key[1], old['p50_ms'], new['p50_ms'],
+            '-' if delta is None else '{:+.1%}'.format(delta),
+            old['queries'], new['queries'], ', '.join(flags)
+        ))
+
+    for key in sorted(set(before) ^ set(after)):
+        print('{:>9} {:<20} only in {}'.format(
+            key[0], key[1], args.before if key in before else args.after))
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
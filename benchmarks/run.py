@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+"""
+Plumbum benchmarks.
+
+Build SQLite fixtures with the models of `examples/03-sqla` and time the
+list, details, create and export views through the Flask test client.
+Results are printed as a table and optionally written as JSON, to be
+compared across commits with `compare.py`.
+
+Usage::
+
+    python benchmarks/run.py --rows 10k,1m --output before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+from flask import Flask
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                os.pardir))
+
+from plumbum import Plumbum, ModelView  # noqa: E402
+from plumbum.model.export import EXPORT_WRITERS  # noqa: E402
+
+
+db = SQLAlchemy()
+
+
+# Models of examples/03-sqla
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    first_name = db.Column(db.String(100))
+    last_name = db.Column(db.String(100))
+    username = db.Column(db.String(80), unique=True)
+    email = db.Column(db.String(120), unique=True)
+
+    def __str__(self):
+        return self.username
+
+
+class Post(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    title = db.Column(db.String(120))
+    text = db.Column(db.Text, nullable=False)
+    date = db.Column(db.DateTime)
+
+    user_id = db.Column(db.Integer, db.ForeignKey(User.id))
+    user = db.relationship(User, backref='posts')
+
+    def __str__(self):
+        return self.title
+
+
+class Tag(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.Unicode(64))
+
+    def __str__(self):
+        return self.name
+
+
+class UserView(ModelView):
+    column_searchable_list = ('username', 'email')
+    can_view_details = True
+    can_export = True
+    export_types = ['csv']
+
+
+class PostView(ModelView):
+    column_exclude_list = ['text']
+    # The user column is sorted by the related username
+    column_sortable_list = ('title', 'date', ('user', 'user.username'))
+    can_view_details = True
+    can_export = True
+
+
+# Users created by the create scenario, removed after each run
+CREATED_PREFIX = 'benchmark-created-'
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do '
+         'eiusmod tempor incididunt ut labore et dolore magna aliqua').split()
+
+
+def parse_size(value):
+    "Parse a row count such as `10000`, `10k` or `1m`."
+    value = value.strip().lower()
+    factor = 1
+    if value[-1:] in ('k', 'm'):
+        factor = 1000 if value[-1] == 'k' else 1000000
+        value = value[:-1]
+    return int(float(value) * factor)
+
+
+def percentile(values, p):
+    "Return the nearest rank `p` percentile of sorted `values`."
+    if not values:
+        return None
+    rank = max(int(round(p / 100.0 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def peak_rss_mb():
+    "Return the peak resident memory of the process in megabytes."
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        rss /= 1024.0
+    return rss / 1024.0
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_fixture(path, rows, seed=0, chunk_size=50000):
+    """
+    Create the SQLite database `path` with `rows` posts, one user per ten
+    posts and 100 tags. Rows are inserted with the sqlite3 module, without
+    the ORM, to build the large fixtures in reasonable time.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + tmp_path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        db.engine.dispose()
+
+    rnd = random.Random(seed)
+    users = max(rows // 10, 1)
+    start = datetime(2015, 1, 1)
+
+    conn = sqlite3.connect(tmp_path)
+    conn.execute('PRAGMA journal_mode = OFF')
+    conn.execute('PRAGMA synchronous = OFF')
+
+    def insert(sql, generate, count):
+        for offset in range(0, count, chunk_size):
+            conn.executemany(sql, (generate(i) for i in
+                                   range(offset + 1,
+                                         min(offset + chunk_size, count) + 1)))
+        conn.commit()
+
+    insert('INSERT INTO user (id, first_name, last_name, username, email) '
+           'VALUES (?, ?, ?, ?, ?)',
+           lambda i: (i, rnd.choice(WORDS).title(), rnd.choice(WORDS).title(),
+                      'user{}'.format(i), 'user{}@example.com'.format(i)),
+           users)
+    insert('INSERT INTO post (id, title, text, date, user_id) '
+           'VALUES (?, ?, ?, ?, ?)',
+           lambda i: (i, ' '.join(rnd.sample(WORDS, 4)).capitalize(),
+                      ' '.join(rnd.choice(WORDS) for _ in range(30)),
+                      str(start + timedelta(minutes=rnd.randrange(2000000))),
+                      rnd.randint(1, users)),
+           rows)
+    insert('INSERT INTO tag (id, name) VALUES (?, ?)',
+           lambda i: (i, '{}-{}'.format(rnd.choice(WORDS), i)), 100)
+
+    conn.execute('ANALYZE')
+    conn.close()
+    os.rename(tmp_path, path)
+
+
+def get_fixture(directory, rows, rebuild=False):
+    "Return the path of the fixture with `rows` posts, building it once."
+    path = os.path.join(directory, 'plumbum-bench-{}.db'.format(rows))
+    if rebuild or not os.path.exists(path):
+        print('Building {} ({} rows)...'.format(path, rows), file=sys.stderr)
+        build_fixture(path, rows)
+    return path
+
+
+def create_app(path, export_rows, tablib_format):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'benchmark'
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['WTF_CSRF_ENABLED'] = False
+    db.init_app(app)
+
+    pb = Plumbum(name='Benchmark', url='/')
+    pb.init_app(app)
+
+    user_view = UserView(User, db.session)
+    post_view = PostView(Post, db.session)
+    user_view.export_max_rows = post_view.export_max_rows = export_rows
+    post_view.export_types = ['csv', tablib_format]
+    # Measure tablib even for formats with a streaming writer
+    post_view.export_writers = dict((name, writer) for name, writer
+                                    in EXPORT_WRITERS.items()
+                                    if name != tablib_format)
+    pb.add_view(user_view)
+    pb.add_view(post_view)
+    pb.add_view(ModelView(Tag, db.session))
+
+    return app, post_view
+
+
+def delete_created():
+    "Keep the fixture unchanged, without the rows of the create scenario."
+    User.query.filter(User.username.startswith(CREATED_PREFIX)) \
+              .delete(synchronize_session=False)
+    db.session.commit()
+
+
+class QueryCounter(object):
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, 'before_cursor_execute', self._execute)
+
+    def _execute(self, *args):
+        self.count += 1
+
+
+def get_scenarios(rows, post_view, tablib_format):
+    """
+    Return the `(name, method, url_factory)` of each scenario, from the
+    cheapest to the most expensive.
+    """
+    columns = [name for name, _ in post_view._list_columns]
+    sort_title = columns.index('title')
+    sort_user = columns.index('user')
+    pages = max(rows // post_view.page_size, 1)
+
+    counter = iter(range(1, sys.maxsize))
+    pk = random.Random(1)
+
+    def new_user():
+        n = next(counter)
+        return '/user/new/', {
+            'username': '{}{}'.format(CREATED_PREFIX, n),
+            'email': '{}{}@example.com'.format(CREATED_PREFIX, n),
+            'first_name': 'Bench',
+            'last_name': 'Mark',
+        }
+
+    return [
+        ('list', 'GET', lambda: '/post/'),
+        ('list_sort_title', 'GET',
+         lambda: '/post/?sort={}'.format(sort_title)),
+        ('list_sort_user_desc', 'GET',
+         lambda: '/post/?sort={}&desc=1'.format(sort_user)),
+        ('list_deep_page', 'GET',
+         lambda: '/post/?page={}'.format(pages // 2)),
+        ('list_last_page', 'GET',
+         lambda: '/post/?page={}'.format(pages - 1)),
+        ('list_search', 'GET', lambda: '/user/?search=user42'),
+        ('details', 'GET',
+         lambda: '/post/{}'.format(pk.randint(1, rows))),
+        ('create_form', 'GET', lambda: '/user/new/'),
+        ('create', 'POST', new_user),
+        ('export_csv', 'GET', lambda: '/post/export/csv/'),
+        ('export_tablib', 'GET',
+         lambda: '/post/export/{}/'.format(tablib_format)),
+    ]
+
+
+def run_scenario(client, queries, method, url_factory, repeat):
+    "Run a scenario `repeat` times after a first, separately timed, run."
+    timings = []
+    query_counts = []
+    statuses = set()
+    first = None
+
+    for i in range(repeat + 1):
+        target = url_factory()
+        queries.count = 0
+
+        start = time.perf_counter()
+        if method == 'POST':
+            url, data = target
+            response = client.post(url, data=data)
+        else:
+            response = client.get(target)
+        response.get_data()
+        elapsed = time.perf_counter() - start
+
+        statuses.add(response.status_code)
+        if i == 0:
+            first = elapsed
+        else:
+            timings.append(elapsed)
+            query_counts.append(queries.count)
+
+    timings.sort()
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': repeat,
+        'status': sorted(statuses),
+        'first_ms': ms(first),
+        'min_ms': ms(timings[0]) if timings else None,
+        'p50_ms': ms(percentile(timings, 50)),
+        'p90_ms': ms(percentile(timings, 90)),
+        'p99_ms': ms(percentile(timings, 99)),
+        'max_ms': ms(timings[-1]) if timings else None,
+        'mean_ms': ms(sum(timings) / len(timings)) if timings else None,
+        'queries': (sum(query_counts) / float(len(query_counts))
+                    if query_counts else None),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+    }
+
+
+def run(rows, args):
+    path = get_fixture(args.db_dir, rows, args.rebuild)
+    app, post_view = create_app(path, args.export_rows, args.tablib_format)
+    results = []
+
+    with app.app_context():
+        delete_created()
+        queries = QueryCounter(db.engine)
+
+    # Without an application context pushed here, every request of the
+    # test client gets its own, so `g` does not outlive a request.
+    client = app.test_client()
+    # Scaffold the views outside the timed requests
+    client.get('/post/')
+
+    for name, method, url_factory in get_scenarios(rows, post_view,
+                                                   args.tablib_format):
+        if args.scenario and name not in args.scenario:
+            continue
+
+        result = run_scenario(client, queries, method, url_factory,
+                              args.repeat)
+        result.update(rows=rows, scenario=name)
+        results.append(result)
+        print_result(result)
+
+    with app.app_context():
+        delete_created()
+        db.engine.dispose()
+
+    return results
+
+
+HEADER = ('rows', 'scenario', 'status', 'first', 'p50', 'p90', 'p99',
+          'queries', 'rss MB')
+ROW_FORMAT = '{:>9} {:<20} {:>7} {:>9} {:>9} {:>9} {:>9} {:>7} {:>7}'
+
+
+def print_result(result):
+    print(ROW_FORMAT.format(
+        result['rows'], result['scenario'],
+        ','.join(map(str, result['status'])),
+        *['{:.2f}'.format(result[k]) if result[k] is not None else '-'
+          for k in ('first_ms', 'p50_ms', 'p90_ms', 'p99_ms')] +
+        ['{:.1f}'.format(result['queries'])
+         if result['queries'] is not None else '-',
+         result['peak_rss_mb']]
+    ))
+    sys.stdout.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[1],
+                                     formatter_class=argparse.
+                                     RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', default='10k',
+                        help='comma separated fixture sizes, for example '
+                             '10k,1m,10m (default: 10k)')
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='timed requests per scenario (default: 20)')
+    parser.add_argument('--scenario', action='append',
+                        help='run only this scenario, can be repeated')
+    parser.add_argument('--export-rows', type=int, default=10000,
+                        help='rows per export, 0 for all (default: 10000)')
+    parser.add_argument('--tablib-format', default='xlsx',
+                        help='format of the tablib export, never '
+                             'streamed (default: xlsx)')
+    parser.add_argument('--db-dir', default=os.path.join(
+                            os.path.dirname(os.path.abspath(__file__)),
+                            'data'),
+                        help='directory of the fixture databases')
+    parser.add_argument('--rebuild', action='store_true',
+                        help='build the fixtures again')
+    parser.add_argument('-o', '--output',
+                        help='write the results as JSON to this file')
+    args = parser.parse_args()
+
+    if not os.path.isdir(args.db_dir):
+        os.makedirs(args.db_dir)
+
+    print('Times in milliseconds, queries per request, peak RSS of the '
+          'process so far.')
+    print(ROW_FORMAT.format(*HEADER))
+
+    results = []
+    for rows in map(parse_size, args.rows.split(',')):
+        results.extend(run(rows, args))
+
+    if args.output:
+        import flask
+        import sqlalchemy
+
+        report = {
+            'meta': {
+                'commit': get_commit(),
+                'date': datetime.utcnow().isoformat() + 'Z',
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'flask': flask.__version__,
+                'sqlalchemy': sqlalchemy.__version__,
+                'sqlite': sqlite3.sqlite_version,
+                'repeat': args.repeat,
+                'export_rows': args.export_rows,
+            },
+            'results': results,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+# -*- coding: utf-8 -*-
+
+from flask import redirect, flash
+from flask_wtf import FlaskForm
+from sqlalchemy.orm import class_mapper
+from sqlalchemy.orm.interfaces import MANYTOONE
+from wtforms.fields import HiddenField
+
+from .babel import gettext, ngettext
+
+
+def action(name, text, confirmation=None):
+    """
+    Decorator to expose a view method as a list action. The method gets an
+    `ActionSelection` with the rows to act on, commits its changes and
+    returns the number of rows changed, or `None` if it failed.
+
+    :param name:
+        Action name, unique in the view
+    :param text:
+        Action label
+    :param confirmation:
+        Optional message the user has to confirm before running the action
+    """
+    def wrap(f):
+        f._action = (name, text, confirmation)
+        return f
+    return wrap
+
+
+class ActionForm(FlaskForm):
+    "Form posted by the list view to run an action, for CSRF protection."
+    action = HiddenField()
+    select_all = HiddenField()
+
+
+def _deletes_related(prop):
+    "Return `True` if the ORM changes related rows when deleting the parent."
+    if prop.viewonly:
+        return False
+    if prop.secondary is not None:
+        return True
+    if prop.direction is MANYTOONE:
+        return prop.cascade.delete
+    # Related rows are deleted or their foreign key set to NULL, unless
+    # left to the database
+    return not prop.passive_deletes
+
+
+class ActionSelection(object):
+    """
+    Rows an action applies to: either the primary keys selected in the list
+    or every row matching `query` (the current search and filters).
+
+    Actions pick how to process them: `iter_ids` yields chunks of primary
+    keys for set based `UPDATE`/`DELETE ... WHERE pk IN (...)` statements,
+    `iter_models` yields the ORM entities, in chunks too, when events,
+    cascades or Python logic are needed.
+    """
+    def __init__(self, view, ids=None, query=None, chunk_size=1000):
+        self.view = view
+        self.ids = ids
+        self.query = query
+        self.chunk_size = chunk_size
+
+        self.model = view.model
+        self.pk = getattr(view.model, view._primary_key)
+
+    def iter_ids(self):
+        "Yield lists of at most `chunk_size` primary keys."
+        if self.ids is not None:
+            for i in range(0, len(self.ids), self.chunk_size):
+                yield self.ids[i:i + self.chunk_size]
+            return
+
+        # Seek through the matching keys, in order, so rows changed or
+        # removed by previous chunks do not shift the next ones.
+        query = self.query.with_entities(self.pk).distinct() \
+                          .order_by(None).order_by(self.pk)
+        last = None
+
+        while True:
+            chunk_query = query if last is None else \
+                query.filter(self.pk > last)
+            ids = [row[0] for row in chunk_query.limit(self.chunk_size)]
+            if not ids:
+                break
+
+            yield ids
+            last = ids[-1]
+
+            if len(ids) < self.chunk_size:
+                break
+
+    def iter_models(self):
+        "Yield lists of at most `chunk_size` model instances."
+        session = self.view.session
+        for ids in self.iter_ids():
+            yield session.query(self.model).filter(self.pk.in_(ids)).all()
+
+    def bulk_delete(self):
+        """
+        Delete the rows with one `DELETE` statement per chunk, without
+        loading them. ORM cascades are not run, only database ones.
+        """
+        session = self.view.session
+        count = 0
+        for ids in self.iter_ids():
+            count += session.query(self.model).filter(self.pk.in_(ids)) \
+                            .delete(synchronize_session=False)
+        return count
+
+    def delete(self):
+        """
+        Delete the rows, in bulk unless the ORM acts on related rows when
+        deleting them (delete cascades, many-to-many tables or foreign keys
+        of related rows set to NULL), in which case they are deleted one by
+        one through the session. Return the number of rows.
+
+        Each chunk is flushed and expunged before loading the next one, so
+        memory does not grow with the selection.
+        """
+        mapper = class_mapper(self.model)
+        if not any(_deletes_related(prop) for prop in mapper.relationships):
+            return self.bulk_delete()
+
+        session = self.view.session
+        count = 0
+        for models in self.iter_models():
+            for model in models:
+                session.delete(model)
+            session.flush()
+            for model in models:
+                session.expunge(model)
+            count += len(models)
+        return count
+
+    def bulk_update(self, values):
+        "Set column `values` with one `UPDATE` statement per chunk."
+        session = self.view.session
+        count = 0
+        for ids in self.iter_ids():
+            count += session.query(self.model).filter(self.pk.in_(ids)) \
+                            .update(values, synchronize_session=False)
+        return count
+
+
+def update_action(name, text, values, confirmation=None):
+    """
+    Build an action setting column `values` on the selected rows with bulk
+    `UPDATE` statements, for example::
+
+        class PostView(ModelView):
+            publish = update_action('publish', 'Publish',
+                                    {'published': True})
+    """
+    @action(name, text, confirmation)
+    def update(self, selection):
+        try:
+            count = selection.bulk_update(values)
+            self.session.commit()
+        except Exception as ex:
+            if not self.handle_view_exception(ex):
+                flash(gettext('Failed to update records. %(error)s',
+                              error=ex), 'error')
+            self.session.rollback()
+            return None
+
+        return count
+
+    return update
+
+
+class ActionsMixin(object):
+    """
+    Actions mixin, discovers the `action` methods of a view and runs them
+    on the rows selected in the list view.
+    """
+    action_chunk_size = 1000
+    """
+    Number of rows processed by each statement (or loaded at once) when
+    running an action.
+    """
+
+    def init_actions(self):
+        "Collect the actions of the view."
+        self._actions = []
+        self._actions_data = {}
+
+        for p in dir(self):
+            # Look up the class, instance properties are not evaluated
+            attr = getattr(type(self), p, None)
+
+            if hasattr(attr, '_action'):
+                name, text, desc = attr._action
+
+                self._actions.append((name, text))
+                # Bind the function to the instance
+                self._actions_data[name] = (getattr(self, p), text, desc)
+
+    def is_action_allowed(self, name):
+        "Override to restrict actions, for example per user."
+        return True
+
+    def get_actions_list(self):
+        "Return `(actions, confirmations)` allowed for the current request."
+        actions = []
+        confirmations = {}
+
+        for name, text in self._actions:
+            if self.is_action_allowed(name):
+                actions.append((name, str(text)))
+
+                confirmation = self._actions_data[name][2]
+                if confirmation:
+                    confirmations[name] = str(confirmation)
+
+        return actions, confirmations
+
+    def get_action_selection(self, form):
+        "Return the `ActionSelection` posted with the action form."
+        raise NotImplementedError()
+
+    def handle_action(self, return_url):
+        "Run the posted action and redirect back to the list."
+        form = ActionForm()
+
+        if form.validate_on_submit():
+            name = form.action.data
+            handler = self._actions_data.get(name)
+
+            if handler and self.is_action_allowed(name):
+                selection = self.get_action_selection(form)
+                count = handler[0](selection)
+
+                if count is not None:
+                    flash(ngettext('Action %(name)s applied to %(num)s '
+                                   'record.',
+                                   'Action %(name)s applied to %(num)s '
+                                   'records.',
+                                   count, name=str(handler[1])),
+                          'success')
+        else:
+            flash(gettext('Failed to perform action.'), 'error')
+
+        return redirect(return_url)
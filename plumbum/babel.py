@@ -19,7 +19,11 @@ except ImportError:
         def ngettext(self, singular, plural, n):
             return singular if n == 1 else plural
 
+    def get_locale():
+        return None
+
 else:
+    from flask_babelex import get_locale as _get_locale
     from . import translations
     from . import tools
     from wtforms.i18n import messages_path
@@ -56,3 +60,13 @@ else:
         def ngettext(self, singular, plural, n):
             t = wtforms_domain.get_translations()
             return t.ungettext(singular, plural, n)
+
+    def get_locale():
+        """
+        Return the active locale, or `None` if Flask-BabelEx is not
+        initialized for the application.
+        """
+        try:
+            return _get_locale()
+        except (KeyError, AttributeError):
+            return None
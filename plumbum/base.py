@@ -2,13 +2,18 @@
 
 import os.path
 from functools import wraps
+from threading import Lock, Thread
+from time import monotonic, perf_counter
 
-from flask import Blueprint, render_template, abort, g, url_for
+from flask import (Blueprint, Response, render_template, abort, g,
+                   url_for)
 from jinja2 import contextfunction
 from flask_webpack import Webpack
 
-from .menu import MenuView
+from .menu import MenuView, MenuEntry
 from .babel import gettext, ngettext, lazy_gettext
+from .instrument import Instrumentation, phase
+from .metrics import Metrics, render_metrics
 from . import tools
 
 
@@ -35,10 +40,30 @@ def _wrap_view(f):
     def inner(self, *args, **kwargs):
         tools.set_current_view(self)
 
-        abort = self._handle_view(f.__name__, **kwargs)
-        if abort is not None:
-            return abort
-        return self._run_view(f, *args, **kwargs)
+        plumbum = self.plumbum
+        timings = None
+        start = None
+        if plumbum is not None:
+            if plumbum.instrumentation.enabled:
+                timings = plumbum.instrumentation.start(self, f.__name__)
+            if plumbum.metrics.enabled:
+                start = perf_counter()
+
+        try:
+            with phase('access'):
+                abort = self._handle_view(f.__name__, **kwargs)
+            if abort is not None:
+                return abort
+            return self._run_view(f, *args, **kwargs)
+        finally:
+            if timings is not None:
+                plumbum.instrumentation.finish(timings)
+            if start is not None:
+                plumbum.metrics.observe(
+                    'plumbum_request_duration_seconds',
+                    (('endpoint', self.endpoint + '.' + f.__name__),),
+                    perf_counter() - start
+                )
 
     inner._wrapped = True
     return inner
@@ -54,7 +79,18 @@ class PlumbumViewMeta(type):
         cls._urls = []
         cls._default_view = None
 
-        for p in dir(cls):
+        # Exposed names: the ones already collected by view base classes
+        # and the decorated attributes of this class and of mixins, which
+        # avoids inspecting every attribute of every view class.
+        names = set()
+        for klass in cls.__mro__:
+            if klass is not cls and isinstance(klass, PlumbumViewMeta):
+                names.update(p for _, p, _ in klass._urls)
+            else:
+                names.update(k for k, v in vars(klass).items()
+                             if hasattr(v, '_urls'))
+
+        for p in sorted(names):
             attr = getattr(cls, p)
 
             if hasattr(attr, '_urls'):
@@ -75,6 +111,16 @@ class BaseView(metaclass=PlumbumViewMeta):
 
     name = None
 
+    access_cache_timeout = None
+    """
+    Seconds access decisions are shared between requests of the same
+    `get_access_cache_key`. Decisions are always reused within a request.
+    """
+
+    # Access decisions shared between requests, by (view, key)
+    _access_decisions = dict()
+    _access_decisions_lock = Lock()
+
     @property
     def _template_args(self):
         args = getattr(g, '_plumbum_template_args', None)
@@ -197,7 +243,8 @@ class BaseView(metaclass=PlumbumViewMeta):
         # Contribute extra arguments
         kwargs.update(self._template_args)
 
-        return render_template(template, **kwargs)
+        with phase('render'):
+            return render_template(template, **kwargs)
 
     def is_visible(self):
         return True
@@ -205,8 +252,66 @@ class BaseView(metaclass=PlumbumViewMeta):
     def is_accessible(self):
         return True
 
+    def get_access_cache_key(self):
+        """
+        Return a hashable identity of the current user, for example its id
+        or role, to share access decisions for `access_cache_timeout`
+        seconds. `None` disables sharing.
+        """
+        return None
+
+    def check_visible(self):
+        "Return `is_visible()`, evaluated once per request."
+        cache = tools.get_request_cache('visible')
+        result = cache.get(self)
+        if result is None:
+            result = cache[self] = bool(self.is_visible())
+        return result
+
+    def check_accessible(self):
+        """
+        Return `is_accessible()`, evaluated once per request and shared
+        between requests when `access_cache_timeout` is set.
+        """
+        cache = tools.get_request_cache('accessible')
+        result = cache.get(self)
+        if result is None:
+            result = cache[self] = self._check_accessible_shared()
+        return result
+
+    def _check_accessible_shared(self):
+        key = None
+        if self.access_cache_timeout:
+            key = self.get_access_cache_key()
+
+        if key is None:
+            return bool(self.is_accessible())
+
+        key = (self, key)
+        now = monotonic()
+        decisions = BaseView._access_decisions
+
+        with self._access_decisions_lock:
+            entry = decisions.get(key)
+
+        hit = entry is not None and entry[0] > now
+        if self.plumbum is not None and self.plumbum.metrics.enabled:
+            self.plumbum.metrics.cache('access', hit)
+        if hit:
+            return entry[1]
+
+        result = bool(self.is_accessible())
+
+        with self._access_decisions_lock:
+            if len(decisions) > 10000:
+                for k in [k for k, e in decisions.items() if e[0] <= now]:
+                    del decisions[k]
+            decisions[key] = (now + self.access_cache_timeout, result)
+
+        return result
+
     def _handle_view(self, name, **kwargs):
-        if not self.is_accessible():
+        if not self.check_accessible():
             return self.inaccessible_callback(name, **kwargs)
 
     def _run_view(self, fn, *args, **kwargs):
@@ -269,6 +374,9 @@ class Plumbum(object):
         self.subdomain = subdomain
         self.base_template = base_template or 'plumbum/base.html'
 
+        self.instrumentation = Instrumentation()
+        self.metrics = Metrics()
+
         # Add index view
         self._set_index_view(index_view=index_view, endpoint=endpoint, url=url)
 
@@ -304,6 +412,9 @@ class Plumbum(object):
     def init_app(self, app, index_view=None, endpoint=None, url=None):
         self.app = app
         self.app.config.setdefault('PLUMBUM_DEBUG_TEMPLATE', False)
+        self.app.config.setdefault('PLUMBUM_INSTRUMENTATION', False)
+        self.app.config.setdefault('PLUMBUM_METRICS', False)
+        self.app.config.setdefault('PLUMBUM_METRICS_URL', '/metrics')
 
         self._init_app()
 
@@ -344,8 +455,16 @@ class Plumbum(object):
         webpack = Webpack()
         webpack.init_app(self.app)
 
+        self.instrumentation.init_app(self.app)
+        self.metrics.init_app(self.app)
+
+        if self.metrics.enabled:
+            self._attach_metrics_view()
+
         if self.app.debug:
             self._attach_show_urls_view()
+            if self.instrumentation.enabled:
+                self._attach_show_timings_view()
 
     def _attach_show_urls_view(self):
         @self.app.route('/urls')
@@ -375,10 +494,108 @@ class Plumbum(object):
 
             return out + '\n'
 
+    def _attach_show_timings_view(self):
+        @self.app.route('/timings')
+        def show_timings():
+            columns = ('endpoint',) + self.instrumentation.phases + \
+                ('other', 'total', 'sql', 'sql time')
+
+            def ms(seconds):
+                return '{:.2f}'.format(seconds * 1000)
+
+            rows = []
+            for timings in reversed(self.instrumentation.history):
+                rows.append(
+                    ('{}.{}'.format(timings.view.endpoint, timings.endpoint),) +
+                    tuple(ms(timings.phases.get(name, 0.0))
+                          for name in self.instrumentation.phases) +
+                    (ms(timings.phases['other']), ms(timings.total),
+                     str(timings.sql_count), ms(timings.sql_time))
+                )
+
+            widths = [max([len(c)] + [len(r[i]) for r in rows])
+                      for i, c in enumerate(columns)]
+            str_template = '%-' + str(widths[0]) + 's' + \
+                ''.join(' %' + str(w) + 's' for w in widths[1:])
+
+            out = (str_template % columns) + '\n' + \
+                '-' * (sum(widths) + len(widths) - 1)
+            for row in rows:
+                out += '\n' + str_template % row
+
+            return out + '\n\nTimes in milliseconds, latest requests first.\n'
+
+    def _attach_metrics_view(self):
+        url = self.app.config.get('PLUMBUM_METRICS_URL', '/metrics')
+
+        # Registered once per application, shared by Plumbum instances
+        if 'plumbum_metrics' in self.app.view_functions:
+            return
+
+        def plumbum_metrics():
+            # One family per metric, samples told apart by instance
+            text = render_metrics([((('plumbum', p.endpoint),), p.metrics)
+                                   for p in self.app.extensions['plumbum']
+                                   if p.metrics.enabled])
+            return Response(text, mimetype='text/plain; version=0.0.4')
+
+        self.app.add_url_rule(url, 'plumbum_metrics', plumbum_metrics)
+
+    def add_timing_hook(self, callback):
+        """
+        Call `callback(timings)` with the `RequestTimings` of every view
+        request, when `PLUMBUM_INSTRUMENTATION` is enabled.
+        """
+        self.instrumentation.add_hook(callback)
+
+    def warmup(self, background=False):
+        """
+        Scaffold the views that deferred it (see `ModelView.lazy_scaffold`),
+        for example in each worker after forking. With `background` the work
+        is done in a daemon thread, which is returned.
+        """
+        views = list(self._views)
+        for view in self._views:
+            views.extend(view._sub_views)
+
+        def run():
+            for view in views:
+                ensure_scaffolded = getattr(view, 'ensure_scaffolded', None)
+                if ensure_scaffolded is not None:
+                    ensure_scaffolded()
+
+        if not background:
+            run()
+            return None
+
+        thread = Thread(target=run, name='plumbum-warmup', daemon=True)
+        thread.start()
+        return thread
+
     def menu(self):
         "Return the menu hierarchy"
         return self._menu
 
+    def resolve_menu(self, view, menu_root=None):
+        """
+        Return the accessible and visible items of `menu_root` (the main
+        menu by default) as `MenuEntry` objects, with URLs and active state
+        computed. The result is computed once per request.
+        """
+        if menu_root is None:
+            menu_root = self._menu
+
+        cache = tools.get_request_cache('menu')
+        key = (id(menu_root), view)
+
+        entries = cache.get(key)
+        if entries is None:
+            entries = cache[key] = [
+                MenuEntry(item, view) for item in menu_root
+                if item.is_accessible() and item.is_visible()
+            ]
+        return entries
+
     def menu_links(self):
         "Return menu links"
         return self._menu_links
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+from collections import deque
+from functools import wraps
+from threading import Lock
+from time import perf_counter, time
+
+from flask import g, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+PHASES = ('access', 'count', 'query', 'format', 'render')
+
+
+class RequestTimings(object):
+    """
+    Timings of one view request. Phase times are exclusive: the time spent
+    formatting cells while rendering is counted as `format`, not `render`.
+    Time outside any phase is reported as `other`.
+    """
+    def __init__(self, view, endpoint):
+        self.view = view
+        self.endpoint = endpoint
+        self.started = time()
+
+        self.phases = dict()
+        self.sql_count = 0
+        self.sql_time = 0.0
+        self.total = None
+
+        self._start = perf_counter()
+        self._stack = []
+
+    def enter(self):
+        self._stack.append(0.0)
+
+    def leave(self, name, elapsed):
+        children = self._stack.pop()
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed - children
+        if self._stack:
+            self._stack[-1] += elapsed
+
+    def finish(self):
+        self.total = perf_counter() - self._start
+        self.phases['other'] = max(self.total - sum(self.phases.values()),
+                                   0.0)
+
+    def to_dict(self):
+        return {
+            'endpoint': self.endpoint,
+            'started': self.started,
+            'total': self.total,
+            'phases': dict(self.phases),
+            'sql_count': self.sql_count,
+            'sql_time': self.sql_time,
+        }
+
+
+def get_timings():
+    "Return the timings of the current request, `None` when not recorded."
+    if not has_app_context():
+        return None
+    return getattr(g, '_plumbum_timings', None)
+
+
+class phase(object):
+    """
+    Context manager timing a phase of the current request, a no-op when
+    instrumentation is disabled::
+
+        with phase('count'):
+            count = query.scalar()
+    """
+    __slots__ = ('name', 'timings', 'start')
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.timings = get_timings()
+        if self.timings is not None:
+            self.timings.enter()
+            self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.timings is not None:
+            self.timings.leave(self.name, perf_counter() - self.start)
+
+
+def timed(name, func):
+    """
+    Wrap `func` to time its calls as phase `name` of the current request.
+    Markers such as Jinja's `contextfunction` are kept.
+    """
+    timings = get_timings()
+    if timings is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        timings.enter()
+        start = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.leave(name, perf_counter() - start)
+
+    return wrapper
+
+
+_sql_events = False
+_sql_events_lock = Lock()
+
+
+def get_query_recorder():
+    """
+    Return the recorder of the SQL statements of the current request, set
+    by the query guard, `None` when not recorded.
+    """
+    if not has_app_context():
+        return None
+    return getattr(g, '_plumbum_query_recorder', None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    recorder = get_query_recorder()
+    if recorder is not None:
+        recorder.add(statement)
+
+    timings = get_timings()
+    if timings is not None:
+        conn.info.setdefault('_plumbum_query_start', []).append(perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    timings = get_timings()
+    starts = conn.info.get('_plumbum_query_start')
+    if timings is not None and starts:
+        timings.sql_count += 1
+        timings.sql_time += perf_counter() - starts.pop()
+
+
+def listen_sql():
+    """
+    Count SQL statements of every engine for the recorded requests, and pass
+    them to the query recorder if any. Engine events are listened once.
+    """
+    global _sql_events
+
+    with _sql_events_lock:
+        if not _sql_events:
+            event.listen(Engine, 'before_cursor_execute',
+                         _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute',
+                         _after_cursor_execute)
+            _sql_events = True
+
+
+class Instrumentation(object):
+    """
+    Per request timings of Plumbum views: access check, count query, data
+    query, row formatting and template render, plus SQL statement counts.
+
+    Enabled with the `PLUMBUM_INSTRUMENTATION` setting. Finished requests
+    are passed to the hooks added with `add_hook` and the last `history`
+    ones are kept for the `/timings` debug view.
+    """
+    phases = PHASES
+
+    def __init__(self, history=100):
+        self.enabled = False
+        self.history = deque(maxlen=history)
+        self._hooks = []
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PLUMBUM_INSTRUMENTATION', False)
+        if self.enabled:
+            listen_sql()
+
+    def add_hook(self, callback):
+        "Call `callback(timings)` with the `RequestTimings` of each request."
+        self._hooks.append(callback)
+
+    def start(self, view, endpoint):
+        if not self.enabled or get_timings() is not None:
+            return None
+
+        timings = g._plumbum_timings = RequestTimings(view, endpoint)
+        return timings
+
+    def finish(self, timings):
+        if timings is None:
+            return
+
+        g._plumbum_timings = None
+        timings.finish()
+        self.history.append(timings)
+
+        for hook in self._hooks:
+            hook(timings)
@@ -85,9 +85,26 @@ class MenuView(BaseMenu):
     def is_visible(self):
         if self._view is None:
             return False
-        return self._view.is_visible()
+        return self._view.check_visible()
 
     def is_accessible(self):
         if self._view is None:
             return False
-        return self._view.is_accessible()
+        return self._view.check_accessible()
+
+
+class MenuEntry(object):
+    """
+    Menu item resolved for one request: its URL, active state and the
+    accessible, visible children are computed once.
+    """
+    def __init__(self, item, view):
+        self.item = item
+        self.name = item.name
+        self.target = item.target
+        self.url = item.get_url()
+        self.class_name = item.get_class_name()
+        self.icon_type = item.get_icon_type()
+        self.icon_value = item.get_icon_value()
+        self.active = item.is_active(view)
+        self.children = [MenuEntry(c, view) for c in item.get_children()]
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+from bisect import bisect_left
+from collections import OrderedDict
+from threading import Lock, current_thread, local
+
+from flask import has_app_context
+
+from . import tools
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n') \
+                     .replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    if extra is not None:
+        labels = labels + (extra,)
+    if not labels:
+        return ''
+    return '{' + ','.join('{}="{}"'.format(k, _escape(v))
+                          for k, v in labels) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class Metrics(object):
+    """
+    Process metrics of Plumbum views in the Prometheus text format.
+
+    Every thread updates its own shard of values, without locking; shards
+    are only merged when the metrics are collected. Each worker process
+    reports its own values, Prometheus aggregates them.
+
+    Metrics are identified by name and a tuple of `(label, value)` pairs.
+    """
+    def __init__(self):
+        self.enabled = False
+
+        self._definitions = OrderedDict()
+        self._local = local()
+        self._shards = []
+        # Values of shards of finished threads
+        self._retired = {}
+        self._lock = Lock()
+
+        self.define('plumbum_request_duration_seconds', 'histogram',
+                    'Time spent in Plumbum views, by endpoint.')
+        self.define('plumbum_count_query_duration_seconds', 'histogram',
+                    'Time spent counting list rows, by view.')
+        self.define('plumbum_export_rows_total', 'counter',
+                    'Rows exported, by view and format.')
+        self.define('plumbum_export_bytes_total', 'counter',
+                    'Bytes exported, by view and format.')
+        self.define('plumbum_cache_requests_total', 'counter',
+                    'Lookups of Plumbum caches, by cache and result.')
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PLUMBUM_METRICS', False)
+
+    def define(self, name, kind, description, buckets=LATENCY_BUCKETS):
+        "Declare metric `name`, a `'counter'` or a `'histogram'`."
+        if kind not in ('counter', 'histogram'):
+            raise ValueError('Invalid metric type: {}'.format(kind))
+        self._definitions[name] = (kind, description, tuple(buckets))
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append((current_thread(), shard))
+        return shard
+
+    def inc(self, name, labels=(), amount=1):
+        "Add `amount` to counter `name`."
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        "Record `value` in histogram `name`."
+        shard = self._shard()
+        key = (name, labels)
+        entry = shard.get(key)
+        if entry is None:
+            # Count per bucket, count above the last bucket and sum
+            buckets = self._definitions[name][2]
+            entry = shard[key] = [0] * (len(buckets) + 2)
+        entry[bisect_left(self._definitions[name][2], value)] += 1
+        entry[-1] += value
+
+    def count(self, name, labels, items, size=None):
+        """
+        Yield `items`, adding one to counter `name` for each of them, or
+        `size(item)` if given.
+        """
+        shard = self._shard()
+        key = (name, labels)
+        for item in items:
+            shard[key] = shard.get(key, 0) + (1 if size is None
+                                              else size(item))
+            yield item
+
+    def cache(self, name, hit):
+        "Record a lookup of cache `name`."
+        self.inc('plumbum_cache_requests_total',
+                 (('cache', name), ('result', 'hit' if hit else 'miss')))
+
+    def collect(self):
+        "Return the merged values by `(name, labels)`."
+        with self._lock:
+            alive = []
+            for thread, shard in self._shards:
+                if thread.is_alive():
+                    alive.append((thread, shard))
+                else:
+                    self._merge(self._retired, shard)
+            self._shards = alive
+
+            values = {}
+            self._merge(values, self._retired)
+            for thread, shard in alive:
+                self._merge(values, shard)
+
+        return values
+
+    @staticmethod
+    def _merge(values, shard):
+        # Copying a dictionary does not release the GIL, unlike iterating it
+        for key, value in dict(shard).items():
+            if isinstance(value, list):
+                total = values.get(key)
+                if total is None:
+                    values[key] = list(value)
+                else:
+                    for i, v in enumerate(value):
+                        total[i] += v
+            else:
+                values[key] = values.get(key, 0) + value
+
+    def render(self):
+        "Return the metrics in the Prometheus text exposition format."
+        return render_metrics([((), self)])
+
+
+def render_metrics(sources):
+    """
+    Return the metrics of several `Metrics` in the Prometheus text
+    exposition format, each family under a single header. `sources` is a
+    list of `(labels, metrics)`, `labels` are added to all the samples of
+    `metrics` to tell them apart.
+    """
+    definitions = OrderedDict()
+    samples = []
+    for labels, metrics in sources:
+        definitions.update(metrics._definitions)
+        samples.extend(((name, labels + sample_labels), value)
+                       for (name, sample_labels), value
+                       in metrics.collect().items())
+    samples.sort(key=lambda item: item[0])
+
+    lines = []
+    for name, (kind, description, buckets) in definitions.items():
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+
+        for (key, labels), value in samples:
+            if key != name:
+                continue
+
+            if kind == 'counter':
+                lines.append('{}{} {}'.format(name, _format_labels(labels),
+                                              _format_value(value)))
+                continue
+
+            cumulative = 0
+            for bound, count in zip(buckets + (float('inf'),), value):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    name, _format_labels(labels,
+                                         ('le', _format_value(bound))),
+                    cumulative))
+            lines.append('{}_sum{} {}'.format(
+                name, _format_labels(labels), _format_value(value[-1])))
+            lines.append('{}_count{} {}'.format(
+                name, _format_labels(labels), cumulative))
+
+    return '\n'.join(lines) + '\n'
+
+
+def get_metrics():
+    """
+    Return the enabled `Metrics` of the Plumbum serving the current view,
+    `None` otherwise.
+    """
+    if not has_app_context():
+        return None
+
+    plumbum = getattr(tools.get_current_view(), 'plumbum', None)
+    if plumbum is None or not plumbum.metrics.enabled:
+        return None
+    return plumbum.metrics
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from collections import OrderedDict
+from hashlib import sha1
+from threading import Lock
+from time import monotonic
+from uuid import uuid4
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, class_mapper
+
+
+class ModelVersions(object):
+    """
+    Change counter per model, bumped when a session commits inserts,
+    updates or deletes of the model, bulk updates and deletes included.
+    Cache keys and validators built from these versions change as soon as
+    the data they depend on does.
+
+    Versions only see changes made through SQLAlchemy sessions of this
+    process, so caches relying on them should also expire entries.
+    """
+    session_key = '_plumbum_changed_models'
+
+    def __init__(self):
+        # Versions restart on every process, the token keeps them apart
+        self.token = uuid4().hex[:8]
+
+        self._versions = {}
+        self._models = set()
+        self._lock = Lock()
+        self._session_events = False
+
+    def register(self, model):
+        "Start tracking changes of `model`."
+        with self._lock:
+            if model in self._models:
+                return
+
+            if not self._session_events:
+                event.listen(Session, 'after_commit', self._after_commit)
+                event.listen(Session, 'after_soft_rollback',
+                             self._after_soft_rollback)
+                event.listen(Session, 'after_bulk_update', self._after_bulk)
+                event.listen(Session, 'after_bulk_delete', self._after_bulk)
+                self._session_events = True
+
+            listener = self._changed(model)
+            for name in ('after_insert', 'after_update', 'after_delete'):
+                event.listen(model, name, listener, propagate=True)
+
+            self._models.add(model)
+            self._versions.setdefault(model, 0)
+
+    def get(self, model):
+        "Return the current version of `model`."
+        with self._lock:
+            return self._versions.get(model, 0)
+
+    def get_key(self, models):
+        "Return a string identifying the current versions of `models`."
+        with self._lock:
+            versions = sorted('{}={}'.format(m.__name__,
+                                             self._versions.get(m, 0))
+                              for m in models)
+        return '{}:{}'.format(self.token, ','.join(versions))
+
+    def bump(self, models):
+        with self._lock:
+            for model in models:
+                self._versions[model] = self._versions.get(model, 0) + 1
+
+    def _changed(self, model):
+        def listener(mapper, connection, target):
+            session = Session.object_session(target)
+            if session is not None:
+                session.info.setdefault(self.session_key, set()).add(model)
+        return listener
+
+    def _after_commit(self, session):
+        models = session.info.pop(self.session_key, None)
+        if models:
+            self.bump(models)
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        # Flushed changes may still be committed by an outer transaction,
+        # changing the version too often is harmless.
+        models = session.info.pop(self.session_key, None)
+        if models:
+            self.bump(models)
+
+    def _after_bulk(self, context):
+        mapper = getattr(context, 'mapper', None)
+
+        with self._lock:
+            models = [m for m in self._models
+                      if mapper is None or
+                      class_mapper(m).common_parent(mapper)]
+
+        if models:
+            context.session.info.setdefault(self.session_key,
+                                            set()).update(models)
+
+
+model_versions = ModelVersions()
+
+
+def make_key(*parts):
+    "Return a string cache key from hashable parts."
+    return sha1(repr(parts).encode('utf-8')).hexdigest()
+
+
+class LRUCache(object):
+    """
+    In process least recently used cache, bounded by the approximate memory
+    used by its values.
+
+    Other cache backends only need the `get(key)` and
+    `set(key, value, timeout)` methods, with string keys.
+
+    :param max_size:
+        Maximum size of the cached values in bytes
+    :param default_timeout:
+        Seconds entries are kept, `None` to keep them until evicted
+    """
+    def __init__(self, max_size=32 * 1024 * 1024, default_timeout=300):
+        self.max_size = max_size
+        self.default_timeout = default_timeout
+
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, size, value = entry
+            if expires is not None and expires <= monotonic():
+                self._remove(key)
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        if timeout is None:
+            timeout = self.default_timeout
+        expires = monotonic() + timeout if timeout else None
+        size = sys.getsizeof(value)
+
+        if size > self.max_size:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = (expires, size, value)
+            self._size += size
+
+            while self._size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def _remove(self, key):
+        self._size -= self._entries.pop(key)[1]
+
+
+_default_cache = None
+_default_cache_lock = Lock()
+
+
+def get_default_cache(app):
+    """
+    Return the process wide page cache, created on first use from the
+    `PLUMBUM_PAGE_CACHE_SIZE` and `PLUMBUM_PAGE_CACHE_TIMEOUT` settings.
+    """
+    global _default_cache
+
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = LRUCache(
+                max_size=app.config.get('PLUMBUM_PAGE_CACHE_SIZE',
+                                        32 * 1024 * 1024),
+                default_timeout=app.config.get('PLUMBUM_PAGE_CACHE_TIMEOUT',
+                                               300),
+            )
+        return _default_cache
@@ -0,0 +1,423 @@
+# -*- coding: utf-8 -*-
+
+from collections import OrderedDict
+from threading import Lock
+from time import monotonic
+
+from sqlalchemy import Table, event, func, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session, class_mapper
+
+from ..metrics import get_metrics
+
+
+def get_dialect(session, model):
+    "Return the dialect of the engine `model` is bound to."
+    return session.get_bind(mapper=class_mapper(model)).dialect
+
+
+class ExactCount(object):
+    "Run the count query every time. This is the default strategy."
+
+    def count(self, view, query, search=None, filters=None):
+        return query.scalar()
+
+    def make_key(self, view, search=None, filters=None):
+        """
+        Return a hashable key for the count of a list request. Only search
+        and filters change the number of rows, so page and sort are ignored.
+        """
+        if filters:
+            filters = tuple(tuple(str(v) for v in f) for f in filters)
+        return view.endpoint, search or None, filters or None
+
+
+class CachedCount(ExactCount):
+    """
+    Cache counts for `timeout` seconds per view, search and filters.
+
+    :param timeout:
+        Seconds a count is reused
+    :param max_entries:
+        Maximum number of cached counts, the oldest ones are dropped first
+    """
+    def __init__(self, timeout=60, max_entries=1024, strategy=None):
+        self.timeout = timeout
+        self.max_entries = max_entries
+        self.strategy = strategy or ExactCount()
+
+        self._cache = OrderedDict()
+        self._lock = Lock()
+
+    def count(self, view, query, search=None, filters=None):
+        key = self.make_key(view, search, filters)
+        now = monotonic()
+
+        with self._lock:
+            entry = self._cache.get(key)
+
+        hit = entry is not None and entry[0] > now
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.cache('count', hit)
+        if hit:
+            return entry[1]
+
+        count = self.strategy.count(view, query, search, filters)
+
+        with self._lock:
+            self._cache[key] = (now + self.timeout, count)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+
+        return count
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class EstimatedCount(ExactCount):
+    """
+    Use the row estimate kept by the database statistics for unfiltered
+    lists. PostgreSQL (`pg_class.reltuples`) and MySQL
+    (`information_schema.tables`) are supported, other backends (SQLite) and
+    filtered lists fall back to an exact count.
+
+    :param threshold:
+        Estimates below this number are replaced by an exact count, which
+        is cheap on small tables and avoids showing stale numbers.
+    """
+    def __init__(self, threshold=10000):
+        self.threshold = threshold
+
+    def count(self, view, query, search=None, filters=None):
+        if not search and not filters:
+            estimate = self.estimate(view, query)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+
+        return query.scalar()
+
+    def estimate(self, view, query):
+        "Return the estimated number of rows of the view model table."
+        mapper = class_mapper(view.model)
+        table = mapper.local_table
+
+        if mapper.single or not isinstance(table, Table):
+            return None
+
+        session = query.session
+        dialect = get_dialect(session, view.model)
+
+        if dialect.name == 'postgresql':
+            name = dialect.identifier_preparer.format_table(table)
+            value = session.execute(
+                text('SELECT reltuples FROM pg_class '
+                     'WHERE oid = CAST(:name AS regclass)'),
+                {'name': name}
+            ).scalar()
+        elif dialect.name == 'mysql':
+            value = session.execute(
+                text('SELECT table_rows FROM information_schema.tables '
+                     'WHERE table_schema = COALESCE(:schema, DATABASE()) '
+                     'AND table_name = :name'),
+                {'schema': table.schema, 'name': table.name}
+            ).scalar()
+        else:
+            return None
+
+        # reltuples is -1 for tables never analyzed
+        if value is None or value < 0:
+            return None
+
+        return int(value)
+
+
+class TimeBoxedCount(ExactCount):
+    """
+    Give up on counting when it takes longer than `budget` seconds.
+
+    The count is interrupted by the database once over budget: with a
+    `statement_timeout` on PostgreSQL, the `MAX_EXECUTION_TIME` optimizer
+    hint on MySQL and a progress handler on SQLite. Other backends
+    (MariaDB included) can not limit it, unfiltered lists use the estimate
+    of `EstimatedCount` there and filtered lists are not counted.
+
+    Slow requests are remembered for `timeout` seconds, during which no
+    count is run and the list view uses the simple pager.
+
+    :param budget:
+        Latency budget in seconds
+    :param timeout:
+        Seconds to skip counting after exceeding the budget
+    """
+    def __init__(self, budget=0.5, timeout=300, strategy=None):
+        self.budget = budget
+        self.timeout = timeout
+        self.strategy = strategy or ExactCount()
+
+        self._slow = {}
+        self._lock = Lock()
+
+    def count(self, view, query, search=None, filters=None):
+        key = self.make_key(view, search, filters)
+        now = monotonic()
+
+        with self._lock:
+            expires = self._slow.get(key)
+            if expires is not None:
+                if expires > now:
+                    return None
+                del self._slow[key]
+
+        count = self._count_limited(view, query, search, filters)
+
+        if count is None or monotonic() - now > self.budget:
+            with self._lock:
+                self._slow[key] = monotonic() + self.timeout
+
+        return count
+
+    def _count_limited(self, view, query, search, filters):
+        dialect = get_dialect(query.session, view.model)
+
+        if dialect.name == 'postgresql':
+            return self._count_postgresql(view, query, search, filters)
+        if dialect.name == 'mysql' and \
+                not getattr(dialect, 'is_mariadb', False):
+            return self._count_mysql(view, query, search, filters)
+        if dialect.name == 'sqlite':
+            connection = query.session.connection(
+                mapper=class_mapper(view.model)).connection
+            if hasattr(connection, 'set_progress_handler'):
+                return self._count_sqlite(connection, view, query, search,
+                                          filters)
+
+        if search or filters:
+            return None
+        return EstimatedCount(threshold=0).estimate(view, query)
+
+    def _count_postgresql(self, view, query, search, filters):
+        session = query.session
+        set_timeout = text("SELECT set_config('statement_timeout', :value, "
+                           "true)")
+
+        # Run inside a savepoint, so a cancelled count does not abort the
+        # request transaction and the setting is restored on rollback.
+        nested = session.begin_nested()
+        try:
+            previous = session.execute(
+                text("SELECT current_setting('statement_timeout')")
+            ).scalar()
+            session.execute(set_timeout,
+                            {'value': str(int(self.budget * 1000))})
+            count = self.strategy.count(view, query, search, filters)
+            session.execute(set_timeout, {'value': previous})
+        except DBAPIError:
+            nested.rollback()
+            return None
+
+        nested.commit()
+        return count
+
+    def _count_mysql(self, view, query, search, filters):
+        # Interrupted SELECT statements leave the transaction usable
+        hint = '/*+ MAX_EXECUTION_TIME({}) */'.format(
+            max(int(self.budget * 1000), 1))
+        try:
+            return self.strategy.count(view, query.prefix_with(hint),
+                                       search, filters)
+        except DBAPIError:
+            return None
+
+    def _count_sqlite(self, connection, view, query, search, filters):
+        deadline = monotonic() + self.budget
+
+        def progress():
+            # Non zero interrupts the statement
+            return monotonic() > deadline
+
+        connection.set_progress_handler(progress, 1000)
+        try:
+            return self.strategy.count(view, query, search, filters)
+        except DBAPIError:
+            return None
+        finally:
+            connection.set_progress_handler(None, 0)
+
+
+class ModelCounters(object):
+    """
+    In memory row counts per model, kept up to date from SQLAlchemy events.
+
+    Inserts and deletes flushed by a session are applied when it commits and
+    dropped when it rolls back. Bulk deletes, when their session commits or
+    rolls back, and rollbacks of flushed changes invalidate the affected
+    counts, which are then counted again on the next request, as are counts
+    older than `resync_interval` seconds (this also picks up changes made by
+    other processes).
+
+    Bulk inserts (`Session.bulk_insert_mappings` and friends) do not emit
+    events, call `invalidate` after running them.
+
+    :param resync_interval:
+        Seconds after which a count is read again from the database, `None`
+        to never resync
+    """
+    session_key = '_plumbum_count_deltas'
+    invalid_key = '_plumbum_count_invalid'
+
+    def __init__(self, resync_interval=300):
+        self.resync_interval = resync_interval
+
+        self._counts = {}
+        self._models = set()
+        self._lock = Lock()
+        self._session_events = False
+
+    def register(self, model):
+        "Start tracking row counts of `model`."
+        with self._lock:
+            if model in self._models:
+                return
+
+            if not self._session_events:
+                event.listen(Session, 'after_commit', self._after_commit)
+                event.listen(Session, 'after_soft_rollback',
+                             self._after_soft_rollback)
+                event.listen(Session, 'after_bulk_delete',
+                             self._after_bulk_delete)
+                self._session_events = True
+
+            event.listen(model, 'after_insert', self._delta(model, 1),
+                         propagate=True)
+            event.listen(model, 'after_delete', self._delta(model, -1),
+                         propagate=True)
+            self._models.add(model)
+
+    def get(self, session, model):
+        "Return the number of rows of `model`, counting them if needed."
+        self.register(model)
+
+        now = monotonic()
+        with self._lock:
+            entry = self._counts.get(model)
+
+        if entry is not None and (self.resync_interval is None or
+                                  now - entry[1] < self.resync_interval):
+            return entry[0]
+
+        return self.resync(session, model)
+
+    def resync(self, session, model):
+        "Count the rows of `model` in the database."
+        count = session.query(func.count('*')).select_from(model).scalar()
+
+        with self._lock:
+            self._counts[model] = (count, monotonic())
+
+        return count
+
+    def invalidate(self, model=None):
+        "Forget the count of `model` (all models if `None`)."
+        with self._lock:
+            if model is None:
+                self._counts.clear()
+            else:
+                self._counts.pop(model, None)
+
+    def _delta(self, model, value):
+        def listener(mapper, connection, target):
+            session = Session.object_session(target)
+            if session is not None:
+                deltas = session.info.setdefault(self.session_key, {})
+                deltas[model] = deltas.get(model, 0) + value
+        return listener
+
+    def _after_commit(self, session):
+        deltas = session.info.pop(self.session_key, None)
+        invalid = session.info.pop(self.invalid_key, None)
+        if not deltas and not invalid:
+            return
+
+        with self._lock:
+            for model, delta in (deltas or {}).items():
+                entry = self._counts.get(model)
+                if entry is not None:
+                    self._counts[model] = (entry[0] + delta, entry[1])
+
+            for model in invalid or ():
+                self._counts.pop(model, None)
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        # The flushed rows may belong to an outer transaction that still
+        # commits, so do not guess and count again instead.
+        models = set(session.info.pop(self.session_key, None) or ())
+        models.update(session.info.pop(self.invalid_key, None) or ())
+        if models:
+            with self._lock:
+                for model in models:
+                    self._counts.pop(model, None)
+
+    def _after_bulk_delete(self, delete_context):
+        # Counted again once the session commits, a count read before
+        # would not see the deleted rows go away
+        mapper = getattr(delete_context, 'mapper', None)
+
+        with self._lock:
+            models = [m for m in self._models
+                      if mapper is None or
+                      class_mapper(m).common_parent(mapper)]
+
+        if models:
+            delete_context.session.info.setdefault(self.invalid_key,
+                                                   set()).update(models)
+
+
+model_counters = ModelCounters()
+
+
+class EventCount(ExactCount):
+    """
+    Answer unfiltered counts from `ModelCounters`, in constant time. Lists
+    with search or filters use `strategy` instead.
+
+    Only use it on views whose `get_count_query` counts all the model rows,
+    which is the default.
+    """
+    def __init__(self, counters=None, strategy=None):
+        self.counters = counters or model_counters
+        self.strategy = strategy or ExactCount()
+
+    def count(self, view, query, search=None, filters=None):
+        if search or filters:
+            return self.strategy.count(view, query, search, filters)
+        return self.counters.get(query.session, view.model)
+
+
+COUNT_STRATEGIES = {
+    'exact': ExactCount,
+    'cached': CachedCount,
+    'estimated': EstimatedCount,
+    'timeboxed': TimeBoxedCount,
+    'events': EventCount,
+}
+
+
+def get_count_strategy(strategy):
+    """
+    Return a count strategy instance from an instance, a class or one of the
+    names in `COUNT_STRATEGIES`.
+    """
+    if strategy is None:
+        return ExactCount()
+    if isinstance(strategy, str):
+        try:
+            strategy = COUNT_STRATEGIES[strategy]
+        except KeyError:
+            raise ValueError('Unknown count strategy: {}'.format(strategy))
+    if isinstance(strategy, type):
+        strategy = strategy()
+    return strategy
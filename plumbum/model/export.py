@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+import csv
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from tempfile import TemporaryFile
+
+try:
+    from openpyxl import Workbook
+except ImportError:
+    Workbook = None
+
+
+class _Echo(object):
+    "File-like object returning what is written, used with `csv.writer`."
+    def write(self, value):
+        return value
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def json_dumps(value):
+    "Serialize `value` to JSON, dates as ISO 8601 and unknown types as text."
+    return json.dumps(value, default=_json_default)
+
+
+def json_object_stream(head, key, items):
+    """
+    Generate a JSON object with the `head` members followed by the `items`
+    array under `key`, serializing one item at a time.
+    """
+    members = ['{}: {}'.format(json_dumps(k), json_dumps(v))
+               for k, v in head.items()]
+    members.append(json_dumps(key) + ': [')
+
+    separator = '{' + ', '.join(members)
+    for item in items:
+        yield separator + json_dumps(item)
+        separator = ', '
+
+    yield (separator if separator.endswith('[') else '') + ']}'
+
+
+class ExportWriter(object):
+    """
+    Base export writer. Writers get the column titles and an iterator of
+    row values and generate the file incrementally, so it can be streamed.
+    """
+    mimetype = 'application/octet-stream'
+
+    def generate(self, titles, rows):
+        raise NotImplementedError()
+
+
+class CsvWriter(ExportWriter):
+    mimetype = 'text/csv'
+
+    def __init__(self, **fmtparams):
+        self.fmtparams = fmtparams
+
+    def generate(self, titles, rows):
+        writer = csv.writer(_Echo(), **self.fmtparams)
+
+        yield writer.writerow(titles)
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class TsvWriter(CsvWriter):
+    mimetype = 'text/tab-separated-values'
+
+    def __init__(self, **fmtparams):
+        fmtparams.setdefault('delimiter', '\t')
+        super(TsvWriter, self).__init__(**fmtparams)
+
+
+class JsonLinesWriter(ExportWriter):
+    "One JSON object per line, keyed by column title."
+    mimetype = 'application/x-ndjson'
+
+    def generate(self, titles, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(titles, row)),
+                             default=_json_default) + '\n'
+
+
+class JsonWriter(ExportWriter):
+    "JSON array of objects keyed by column title, like tablib does."
+    mimetype = 'application/json'
+
+    def generate(self, titles, rows):
+        separator = '[\n'
+        for row in rows:
+            yield separator + json.dumps(dict(zip(titles, row)),
+                                         default=_json_default)
+            separator = ',\n'
+
+        yield '[]' if separator == '[\n' else '\n]'
+
+
+class XlsxWriter(ExportWriter):
+    """
+    Excel workbook written with openpyxl write-only mode, which keeps memory
+    constant. The zip container can only be sent once completely written,
+    it is spooled to a temporary file meanwhile.
+    """
+    mimetype = ('application/vnd.openxmlformats-officedocument.'
+                'spreadsheetml.sheet')
+    chunk_size = 64 * 1024
+
+    def generate(self, titles, rows):
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+
+        ws.append(titles)
+        for row in rows:
+            ws.append([self.cell_value(v) for v in row])
+
+        with TemporaryFile() as f:
+            wb.save(f)
+            f.seek(0)
+
+            for chunk in iter(lambda: f.read(self.chunk_size), b''):
+                yield chunk
+
+    def cell_value(self, value):
+        if value is None or isinstance(value, (bool, int, float, Decimal,
+                                               date, datetime, time)):
+            return value
+        return str(value)
+
+
+EXPORT_WRITERS = {
+    'csv': CsvWriter(),
+    'tsv': TsvWriter(),
+    'json': JsonWriter(),
+    'jsonl': JsonLinesWriter(),
+}
+
+if Workbook is not None:
+    EXPORT_WRITERS['xlsx'] = XlsxWriter()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import types, not_, or_
+
+from ..babel import lazy_gettext
+from .search import escape_like
+
+
+def _clean_bool(value):
+    if value not in ('1', '0'):
+        raise ValueError('Invalid boolean: {}'.format(value))
+    return value == '1'
+
+
+def _clean_date(value):
+    return datetime.strptime(value.strip(), '%Y-%m-%d').date()
+
+
+def _clean_datetime(value):
+    value = value.strip()
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            pass
+    raise ValueError('Invalid datetime: {}'.format(value))
+
+
+def _clean_time(value):
+    value = value.strip()
+    for fmt in ('%H:%M:%S', '%H:%M'):
+        try:
+            return datetime.strptime(value, fmt).time()
+        except ValueError:
+            pass
+    raise ValueError('Invalid time: {}'.format(value))
+
+
+BOOLEAN_OPTIONS = (('1', lazy_gettext('Yes')), ('0', lazy_gettext('No')))
+
+
+class BaseFilter(object):
+    """
+    Base list filter. A filter wraps a column and builds the SQL clause for
+    a value taken from the URL.
+
+    Filters are resolved once when the view is scaffolded: `column` may be
+    given as a column name (`'<relationship>.<column>'` for related
+    columns) and is replaced by the column itself, and `joins` gets the
+    relationship path to join.
+
+    :param column:
+        Model column, attribute or name
+    :param name:
+        Label shown to the user
+    :param options:
+        Sequence of `(value, label)` to choose the value from
+    :param data_type:
+        Input type hint for the template
+    :param clean:
+        Callable converting the URL string to the value compared with the
+        column, it must raise `ValueError` for invalid values
+    """
+    def __init__(self, column, name, options=None, data_type=None,
+                 clean=None):
+        self.column = column
+        self.name = name
+        self.options = options
+        self.data_type = data_type
+        self.clean_value = clean or (lambda value: value)
+        self.joins = None
+
+    def operation(self):
+        raise NotImplementedError()
+
+    def get_column(self, alias=None):
+        "Return the column, or the same column of the joined `alias`."
+        return self.column if alias is None else getattr(alias,
+                                                         self.column.key)
+
+    def validate(self, value):
+        try:
+            self.clean(value)
+        except (ValueError, ArithmeticError):
+            return False
+        return True
+
+    def clean(self, value):
+        return self.clean_value(value)
+
+    def clause(self, column, value):
+        "Return the SQL clause for an already cleaned `value`."
+        raise NotImplementedError()
+
+    def apply(self, query, value, alias=None):
+        return query.filter(self.clause(self.get_column(alias), value))
+
+    def __str__(self):
+        return '{} {}'.format(self.name, self.operation())
+
+
+class FilterEqual(BaseFilter):
+    def operation(self):
+        return lazy_gettext('equals')
+
+    def clause(self, column, value):
+        return column == value
+
+
+class FilterNotEqual(BaseFilter):
+    def operation(self):
+        return lazy_gettext('not equal')
+
+    def clause(self, column, value):
+        return or_(column != value, column.is_(None))
+
+
+class FilterLike(BaseFilter):
+    def operation(self):
+        return lazy_gettext('contains')
+
+    def clause(self, column, value):
+        return column.ilike('%{}%'.format(escape_like(value)), escape='\\')
+
+
+class FilterNotLike(FilterLike):
+    def operation(self):
+        return lazy_gettext('not contains')
+
+    def clause(self, column, value):
+        return or_(not_(super(FilterNotLike, self).clause(column, value)),
+                   column.is_(None))
+
+
+class FilterGreater(BaseFilter):
+    def operation(self):
+        return lazy_gettext('greater than')
+
+    def clause(self, column, value):
+        return column > value
+
+
+class FilterSmaller(BaseFilter):
+    def operation(self):
+        return lazy_gettext('smaller than')
+
+    def clause(self, column, value):
+        return column < value
+
+
+class FilterBetween(BaseFilter):
+    "Inclusive range, the value is written as `'<start> to <end>'`."
+    separator = ' to '
+
+    def operation(self):
+        return lazy_gettext('between')
+
+    def clean(self, value):
+        parts = value.split(self.separator)
+        if len(parts) != 2:
+            raise ValueError('Invalid range: {}'.format(value))
+        return tuple(self.clean_value(part) for part in parts)
+
+    def clause(self, column, value):
+        return column.between(*value)
+
+
+class FilterInList(BaseFilter):
+    "Match any of a comma separated list of values."
+    def operation(self):
+        return lazy_gettext('in list')
+
+    def clean(self, value):
+        values = [v.strip() for v in value.split(',') if v.strip()]
+        if not values:
+            raise ValueError('Empty list')
+        return [self.clean_value(v) for v in values]
+
+    def clause(self, column, value):
+        return column.in_(value)
+
+
+class FilterNotInList(FilterInList):
+    def operation(self):
+        return lazy_gettext('not in list')
+
+    def clause(self, column, value):
+        return or_(column.notin_(value), column.is_(None))
+
+
+class FilterEmpty(BaseFilter):
+    "Check for NULL values, `'1'` selects empty rows and `'0'` the rest."
+    def __init__(self, column, name, options=None, data_type=None,
+                 clean=None):
+        super(FilterEmpty, self).__init__(column, name,
+                                          options or BOOLEAN_OPTIONS,
+                                          data_type, clean or _clean_bool)
+
+    def operation(self):
+        return lazy_gettext('empty')
+
+    def clause(self, column, value):
+        return column.is_(None) if value else column.isnot(None)
+
+
+class FilterConverter(object):
+    """
+    Build the default filters of a column from its type. Columns with
+    choices get equality and list filters on those choices.
+    """
+    string_filters = (FilterLike, FilterNotLike, FilterEqual, FilterNotEqual,
+                      FilterInList)
+    number_filters = (FilterEqual, FilterNotEqual, FilterGreater,
+                      FilterSmaller, FilterBetween, FilterInList)
+    date_filters = (FilterEqual, FilterNotEqual, FilterGreater,
+                    FilterSmaller, FilterBetween)
+    bool_filters = (FilterEqual, FilterNotEqual)
+    choice_filters = (FilterEqual, FilterNotEqual, FilterInList,
+                      FilterNotInList)
+
+    def convert(self, column, name, choices=None):
+        "Return the list of filters for `column`, empty if not supported."
+        column_type = column.type
+        options = None
+        data_type = None
+
+        if choices:
+            filters, clean = self.choice_filters, None
+            options = choices
+        elif isinstance(column_type, types.Boolean):
+            filters, clean = self.bool_filters, _clean_bool
+            options = BOOLEAN_OPTIONS
+        elif isinstance(column_type, types.Enum):
+            filters, clean = self.choice_filters, None
+            options = [(e, e) for e in column_type.enums]
+        elif isinstance(column_type, types.String):
+            filters, clean = self.string_filters, None
+        elif isinstance(column_type, types.Integer):
+            filters, clean = self.number_filters, int
+        elif isinstance(column_type, types.Float):
+            filters, clean = self.number_filters, float
+        elif isinstance(column_type, types.Numeric):
+            filters, clean = self.number_filters, Decimal
+        elif isinstance(column_type, types.DateTime):
+            filters, clean = self.date_filters, _clean_datetime
+            data_type = 'datetime'
+        elif isinstance(column_type, types.Date):
+            filters, clean = self.date_filters, _clean_date
+            data_type = 'date'
+        elif isinstance(column_type, types.Time):
+            filters, clean = self.date_filters, _clean_time
+            data_type = 'time'
+        else:
+            return []
+
+        # List values are typed, not picked from the options
+        result = [f(column, name, data_type=data_type, clean=clean,
+                    options=None if issubclass(f, FilterInList) else options)
+                  for f in filters]
+
+        if column.nullable:
+            result.append(FilterEmpty(column, name))
+
+        return result
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import re
+import warnings
+from collections import Counter
+from functools import wraps
+
+from flask import g
+
+from ..instrument import get_query_recorder, listen_sql
+
+
+class QueryBudgetExceeded(Exception):
+    "Raised by the query guard in `'raise'` mode."
+
+
+class QueryBudgetWarning(UserWarning):
+    "Issued by the query guard in `'warn'` mode."
+
+
+_string_re = re.compile(r"'(?:[^']|'')*'")
+_number_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+_in_list_re = re.compile(r'\bIN\s*\([^()]*\)', re.IGNORECASE)
+_space_re = re.compile(r'\s+')
+
+
+def normalize_sql(statement):
+    """
+    Return `statement` without literals, `IN` lists or layout, so that the
+    statements run for each row of a page compare equal.
+    """
+    statement = _string_re.sub('?', statement)
+    statement = _number_re.sub('?', statement)
+    statement = _in_list_re.sub('IN (...)', statement)
+    return _space_re.sub(' ', statement).strip()
+
+
+class QueryRecorder(object):
+    """
+    SQL statements run during a request, with the list column being
+    formatted when they ran, if any.
+    """
+    def __init__(self):
+        self.statements = []
+        self.column = None
+
+    def add(self, statement):
+        self.statements.append((normalize_sql(statement), self.column))
+
+
+def track_columns(func):
+    """
+    Wrap a `get_value(..., model, name)` template function to record the
+    column each statement is run for. Markers such as Jinja's
+    `contextfunction` are kept.
+    """
+    recorder = get_query_recorder()
+    if recorder is None:
+        return func
+
+    @wraps(func)
+    def wrapper(*args):
+        previous = recorder.column
+        recorder.column = args[-1]
+        try:
+            return func(*args)
+        finally:
+            recorder.column = previous
+
+    return wrapper
+
+
+def get_guard_mode(value):
+    """
+    Return the query guard mode of a `PLUMBUM_QUERY_GUARD` value, `None` if
+    the guard is disabled. True values other than strings mean `'warn'`.
+    """
+    if not value:
+        return None
+    if not isinstance(value, str):
+        return 'warn'
+    if value not in ('warn', 'raise'):
+        raise ValueError('Invalid query guard mode: {}'.format(value))
+    return value
+
+
+class QueryGuard(object):
+    """
+    Debug check of the SQL statements run by a view request. It reports
+    requests running more than `budget` statements and statements repeated
+    `repeat` times or more, typically lazy loads run for each row of a page
+    (the N+1 pattern), naming the list column they were run for.
+
+    :param budget:
+        Maximum number of statements per request, `None` for no limit
+    :param repeat:
+        Number of runs of the same statement reported as N+1 pattern
+    :param mode:
+        `'warn'` to issue a `QueryBudgetWarning`, `'raise'` to raise
+        `QueryBudgetExceeded`
+    """
+    def __init__(self, budget=20, repeat=5, mode='warn'):
+        if mode not in ('warn', 'raise'):
+            raise ValueError('Invalid query guard mode: {}'.format(mode))
+
+        self.budget = budget
+        self.repeat = repeat
+        self.mode = mode
+
+    def start(self):
+        "Record the statements of the current request."
+        listen_sql()
+        recorder = g._plumbum_query_recorder = QueryRecorder()
+        return recorder
+
+    def stop(self):
+        g._plumbum_query_recorder = None
+
+    def get_report(self, view, name, recorder):
+        "Return the problems found in `recorder`, `None` if there are none."
+        total = len(recorder.statements)
+        labels = dict(getattr(view, '_list_columns', None) or ())
+        problems = []
+
+        if self.budget is not None and total > self.budget:
+            problems.append('ran {} SQL statements, the budget is {}'.format(
+                total, self.budget))
+
+        # Runs of each statement, by column
+        runs = {}
+        for statement, column in recorder.statements:
+            runs.setdefault(statement, Counter())[column] += 1
+
+        for statement, columns in sorted(runs.items()):
+            count = sum(columns.values())
+            if count < self.repeat:
+                continue
+
+            names = ', '.join("'{}' ({})".format(c, labels.get(c, c))
+                              for c, _ in columns.most_common()
+                              if c is not None)
+            problems.append('ran {} times{}: {}'.format(
+                count, ' formatting column ' + names if names else '',
+                statement))
+
+        if not problems:
+            return None
+
+        return '{}.{} {}'.format(view.endpoint, name, '\n  '.join(problems))
+
+    def check(self, view, name, recorder):
+        "Warn about or raise the problems found in `recorder`."
+        report = self.get_report(view, name, recorder)
+        if report is None:
+            return
+
+        if self.mode == 'raise':
+            raise QueryBudgetExceeded(report)
+        warnings.warn(report, QueryBudgetWarning, stacklevel=3)
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+
+import json
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import NamedTemporaryFile, gettempdir
+from threading import Lock
+from time import time
+from uuid import uuid4
+
+from flask_wtf import FlaskForm
+
+
+log = logging.getLogger(__name__)
+
+_job_id_re = re.compile(r'^[0-9a-f]{32}$')
+
+
+class ExportJobForm(FlaskForm):
+    "Form posted to start a background export, for CSRF protection."
+
+
+class ExportJob(object):
+    """
+    State of a background export, saved as JSON next to the export file so
+    that every process sharing the spool directory can read it.
+    """
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    save_interval = 1
+    "Seconds between saves of the row count of a running job."
+
+    fields = ('id', 'endpoint', 'export_type', 'filename', 'status', 'rows',
+              'error', 'created', 'finished')
+
+    def __init__(self, endpoint, export_type, filename, spool_dir,
+                 id=None):
+        self.id = id or uuid4().hex
+        self.endpoint = endpoint
+        self.export_type = export_type
+        self.filename = filename
+        self.spool_dir = spool_dir
+        self.path = os.path.join(spool_dir, self.id)
+
+        self.status = self.PENDING
+        self.rows = 0
+        self.error = None
+        self.created = time()
+        self.finished = None
+
+        self._saved = 0
+
+    @classmethod
+    def load(cls, spool_dir, job_id):
+        "Return the job `job_id` saved in `spool_dir`, `None` if not found."
+        if not _job_id_re.match(job_id):
+            return None
+
+        try:
+            with open(os.path.join(spool_dir, job_id + '.json')) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        job = cls(data['endpoint'], data['export_type'], data['filename'],
+                  spool_dir, id=job_id)
+        for name in cls.fields:
+            setattr(job, name, data[name])
+        return job
+
+    @property
+    def meta_path(self):
+        return self.path + '.json'
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
+
+    def add_row(self):
+        "Count an exported row, saving the count from time to time."
+        self.rows += 1
+        if time() - self._saved > self.save_interval:
+            self.save()
+
+    def save(self):
+        "Write the job state, atomically replacing the previous one."
+        data = dict((name, getattr(self, name)) for name in self.fields)
+
+        with NamedTemporaryFile('w', dir=self.spool_dir, suffix='.tmp',
+                                delete=False) as f:
+            json.dump(data, f)
+        os.replace(f.name, self.meta_path)
+
+        self._saved = time()
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'export_type': self.export_type,
+            'filename': self.filename,
+            'status': self.status,
+            'rows': self.rows,
+            'error': self.error,
+        }
+
+
+class ExportJobQueue(object):
+    """
+    Run exports on a local thread pool and keep their result and state in a
+    spool directory, no external broker needed. Jobs and files are removed
+    `max_age` seconds after their last update.
+
+    Any process sharing the spool directory, such as the workers of a
+    gunicorn or uWSGI server, can report the status of a job and serve its
+    file, whichever process runs it. Workers on several hosts need a
+    shared filesystem.
+
+    Jobs run in threads, not processes, because they need the application,
+    the view and its SQLAlchemy session. Being mostly database and I/O
+    bound, they do not suffer much from the GIL.
+
+    :param spool_dir:
+        Directory where jobs and export files are written, `plumbum-export`
+        in the temporary directory by default
+    :param max_workers:
+        Number of exports running at the same time in this process
+    :param max_age:
+        Seconds jobs are kept after their last update
+    """
+    def __init__(self, spool_dir=None, max_workers=2, max_age=3600):
+        if spool_dir is None:
+            spool_dir = os.path.join(gettempdir(), 'plumbum-export')
+        os.makedirs(spool_dir, mode=0o700, exist_ok=True)
+
+        self.spool_dir = spool_dir
+        self.max_age = max_age
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, endpoint, export_type, filename, func):
+        """
+        Queue a new export job. `func(job, fileobj)` writes the export into
+        the binary file object and calls `job.add_row()` for each row.
+        """
+        self.cleanup()
+
+        job = ExportJob(endpoint, export_type, filename, self.spool_dir)
+        job.save()
+
+        self.executor.submit(self._run, job, func)
+        return job
+
+    def get(self, job_id):
+        return ExportJob.load(self.spool_dir, job_id)
+
+    def cleanup(self):
+        "Remove jobs not updated for more than `max_age` seconds."
+        expired = time() - self.max_age
+
+        for name in os.listdir(self.spool_dir):
+            base, ext = os.path.splitext(name)
+            if ext not in ('.json', '.tmp'):
+                continue
+
+            path = os.path.join(self.spool_dir, name)
+            try:
+                if os.path.getmtime(path) >= expired:
+                    continue
+            except OSError:
+                continue
+
+            self._remove_file(path)
+            if ext == '.json':
+                self._remove_file(os.path.join(self.spool_dir, base))
+
+    def _run(self, job, func):
+        job.status = job.RUNNING
+        job.save()
+
+        status = job.FAILED
+        try:
+            with open(job.path, 'wb') as f:
+                func(job, f)
+            status = job.DONE
+        except Exception as ex:
+            log.exception('Export job %s failed', job.id)
+            self._remove_file(job.path)
+            job.error = str(ex)
+        finally:
+            job.finished = time()
+            job.status = status
+            job.save()
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_default_queue = None
+_default_queue_lock = Lock()
+
+
+def get_default_queue(app):
+    """
+    Return the process wide export queue, created on first use from the
+    `PLUMBUM_EXPORT_SPOOL_DIR`, `PLUMBUM_EXPORT_WORKERS` and
+    `PLUMBUM_EXPORT_MAX_AGE` settings.
+    """
+    global _default_queue
+
+    with _default_queue_lock:
+        if _default_queue is None:
+            _default_queue = ExportJobQueue(
+                spool_dir=app.config.get('PLUMBUM_EXPORT_SPOOL_DIR'),
+                max_workers=app.config.get('PLUMBUM_EXPORT_WORKERS', 2),
+                max_age=app.config.get('PLUMBUM_EXPORT_MAX_AGE', 3600),
+            )
+        return _default_queue
@@ -0,0 +1,372 @@
+# -*- coding: utf-8 -*-
+
+from copy import copy
+from threading import Lock
+
+from sqlalchemy import (Float, Integer, String, cast, event, inspect, or_,
+                        select, text)
+from sqlalchemy.sql import visitors
+from sqlalchemy.sql.expression import column as sql_column
+from sqlalchemy.orm import Session, class_mapper
+
+
+def parse_search_terms(search):
+    "Split a search string in terms, ignoring empty ones."
+    return [term for term in search.split() if term]
+
+
+def quote_identifier(name):
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def escape_like(term, escape='\\'):
+    "Escape LIKE wildcards in `term`."
+    return term.replace(escape, escape * 2) \
+               .replace('%', escape + '%') \
+               .replace('_', escape + '_')
+
+
+class BaseSearch(object):
+    """
+    Base search backend. Backends are set up once per view with the
+    resolved `(column, join path)` pairs of `column_searchable_list`.
+    """
+    def setup(self, view, fields):
+        self.fields = fields
+
+    def apply(self, view, query, count_query, joins, count_joins, search,
+              rank=False):
+        """
+        Filter `query` and `count_query` by `search` and return
+        `(query, count_query, joins, count_joins)`. If `rank` is `True` the
+        backend may order the results by relevance.
+        """
+        raise NotImplementedError()
+
+
+class LikeSearch(BaseSearch):
+    """
+    Match every search term against any searchable column with `ILIKE`.
+    Needs no index, but scans the table, so it suits small tables. Columns
+    which are not strings are matched as text.
+    """
+    def apply(self, view, query, count_query, joins, count_joins, search,
+              rank=False):
+        terms = parse_search_terms(search)
+        if not terms:
+            return query, count_query, joins, count_joins
+
+        # Columns with their aliases, for query and count query
+        columns = []
+        count_columns = []
+
+        for column, path in self.fields:
+            query, joins, alias = view._apply_path_joins(query, joins, path,
+                                                         inner_join=False)
+            columns.append(self._text(column if alias is None
+                                      else getattr(alias, column.key)))
+
+            if count_query is not None:
+                count_query, count_joins, alias = view._apply_path_joins(
+                    count_query, count_joins, path, inner_join=False)
+                count_columns.append(self._text(
+                    column if alias is None else getattr(alias, column.key)))
+
+        for term in terms:
+            value = '%{}%'.format(escape_like(term))
+
+            query = query.filter(or_(*[c.ilike(value, escape='\\')
+                                       for c in columns]))
+            if count_query is not None:
+                count_query = count_query.filter(
+                    or_(*[c.ilike(value, escape='\\') for c in count_columns])
+                )
+
+        return query, count_query, joins, count_joins
+
+    def _text(self, column):
+        if isinstance(column.type, String):
+            return column
+        return cast(column, String)
+
+
+class FTSIndex(object):
+    """
+    SQLite FTS5 table shadowing searchable columns of a model, kept in sync
+    from SQLAlchemy mapper events, in the same transaction as the changes.
+    The model needs a single integer primary key, used as FTS rowid.
+    """
+    _indexes = {}
+    _indexes_lock = Lock()
+
+    @classmethod
+    def get(cls, model, columns, name=None):
+        "Return the index of `model`, creating it on first use."
+        name = name or '{}_fts'.format(class_mapper(model).local_table.name)
+
+        with cls._indexes_lock:
+            index = cls._indexes.get(name)
+            if index is None:
+                index = cls._indexes[name] = cls(model, columns, name)
+            elif [c.key for c in index.columns] != [c.key for c in columns]:
+                raise Exception('FTS index {} already exists with other '
+                                'columns'.format(name))
+            return index
+
+    def __init__(self, model, columns, name):
+        mapper = class_mapper(model)
+
+        if len(mapper.primary_key) != 1 or \
+                not isinstance(mapper.primary_key[0].type, Integer):
+            raise Exception('FTS search requires a single integer primary '
+                            'key: {}'.format(model.__name__))
+
+        self.model = model
+        self.columns = columns
+        self.name = name
+        self.pk = mapper.primary_key[0]
+        self.pk_key = mapper.get_property_by_column(self.pk).key
+        self.keys = [mapper.get_property_by_column(c).key for c in columns]
+
+        table = mapper.local_table
+        self.table = quote_identifier(table.name)
+        if table.schema:
+            self.table = quote_identifier(table.schema) + '.' + self.table
+
+        self._name = quote_identifier(name)
+        self._columns = ', '.join(quote_identifier(c.name) for c in columns)
+
+        self._ready = False
+        self._lock = Lock()
+
+        event.listen(model, 'after_insert', self._after_insert,
+                     propagate=True)
+        event.listen(model, 'after_update', self._after_update,
+                     propagate=True)
+        event.listen(model, 'after_delete', self._after_delete,
+                     propagate=True)
+        event.listen(Session, 'after_bulk_update', self._after_bulk_update)
+        event.listen(Session, 'after_bulk_delete', self._after_bulk_delete)
+
+    def is_ready(self, connection):
+        "Return `True` if the FTS table exists."
+        if not self._ready and connection.dialect.name == 'sqlite':
+            self._ready = bool(connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND "
+                     "name = :name"), {'name': self.name}
+            ).scalar())
+        return self._ready
+
+    def ensure(self, engine):
+        """
+        Create and populate the FTS table, in its own transaction, if it
+        does not exist. Return `False` if the database is not SQLite.
+        """
+        if engine.dialect.name != 'sqlite':
+            return False
+
+        with self._lock:
+            with engine.begin() as connection:
+                if not self.is_ready(connection):
+                    connection.execute(text(
+                        'CREATE VIRTUAL TABLE {} USING fts5({})'.format(
+                            self._name, self._columns)
+                    ))
+                    self.rebuild(connection)
+                    self._ready = True
+
+        return True
+
+    def rebuild(self, connection):
+        "Index again all the model rows."
+        connection.execute(text('DELETE FROM {}'.format(self._name)))
+        connection.execute(text(
+            'INSERT INTO {} (rowid, {}) SELECT {}, {} FROM {}'.format(
+                self._name, self._columns, quote_identifier(self.pk.name),
+                self._columns, self.table
+            )
+        ))
+
+    def _insert(self, connection, target):
+        params = ', '.join(':c{}'.format(i) for i in range(len(self.keys)))
+        values = dict(('c{}'.format(i), getattr(target, key))
+                      for i, key in enumerate(self.keys))
+        values['rowid'] = getattr(target, self.pk_key)
+
+        connection.execute(
+            text('INSERT INTO {} (rowid, {}) VALUES (:rowid, {})'.format(
+                self._name, self._columns, params)),
+            values
+        )
+
+    def _reindex(self, connection, rowids):
+        "Index again the rows of `rowids`."
+        params = [{'rowid': rowid} for rowid in rowids]
+        if not params:
+            return
+
+        connection.execute(
+            text('DELETE FROM {} WHERE rowid = :rowid'.format(self._name)),
+            params
+        )
+        connection.execute(text(
+            'INSERT INTO {} (rowid, {}) SELECT {}, {} FROM {} '
+            'WHERE {} = :rowid'.format(
+                self._name, self._columns, quote_identifier(self.pk.name),
+                self._columns, self.table, quote_identifier(self.pk.name)
+            )
+        ), params)
+
+    def _delete(self, connection, rowid):
+        connection.execute(
+            text('DELETE FROM {} WHERE rowid = :rowid'.format(self._name)),
+            {'rowid': rowid}
+        )
+
+    # Until the FTS table exists changes are not tracked, the table is
+    # populated from scratch when created.
+    def _after_insert(self, mapper, connection, target):
+        if self.is_ready(connection):
+            self._insert(connection, target)
+
+    def _after_update(self, mapper, connection, target):
+        state = inspect(target)
+        if not any(state.attrs[key].history.has_changes()
+                   for key in self.keys):
+            return
+
+        if self.is_ready(connection):
+            self._delete(connection, getattr(target, self.pk_key))
+            self._insert(connection, target)
+
+    def _after_delete(self, mapper, connection, target):
+        if self.is_ready(connection):
+            self._delete(connection, getattr(target, self.pk_key))
+
+    def _is_target(self, context):
+        mapper = getattr(context, 'mapper', None)
+        return mapper is not None and mapper.isa(class_mapper(self.model))
+
+    def _indexes_column(self, key):
+        return any(key is c for c in self.columns) or \
+            getattr(key, 'key', key) in self.keys
+
+    def _after_bulk_update(self, update_context):
+        if not self._ready or not self._is_target(update_context):
+            return
+
+        if not any(self._indexes_column(key) for key in
+                   dict(update_context.values)):
+            return
+
+        connection = update_context.session.connection(
+            mapper=class_mapper(self.model))
+        criteria = update_context.query.whereclause
+
+        # The updated rows can be selected again unless the criteria use
+        # indexed columns, which may have changed
+        columns = []
+        if criteria is not None:
+            visitors.traverse(criteria, {}, {'column': columns.append})
+
+        if criteria is None or any(self._indexes_column(c) for c in columns):
+            self.rebuild(connection)
+        else:
+            self._reindex(connection, [row[0] for row in connection.execute(
+                select([self.pk]).where(criteria))])
+
+    def _after_bulk_delete(self, delete_context):
+        if self._ready and self._is_target(delete_context):
+            connection = delete_context.session.connection(
+                mapper=class_mapper(self.model))
+            connection.execute(text(
+                'DELETE FROM {} WHERE rowid NOT IN (SELECT {} FROM {})'.format(
+                    self._name, quote_identifier(self.pk.name), self.table)
+            ))
+
+    def match_expression(self, search):
+        """
+        Build a FTS5 query from user input: every term must match, as a
+        prefix, and FTS operators are not interpreted.
+        """
+        return ' '.join('"{}"*'.format(term.replace('"', '""'))
+                        for term in parse_search_terms(search))
+
+    def subquery(self, search):
+        "Return a `(rowid, rank)` selectable of the rows matching `search`."
+        return text(
+            'SELECT rowid, rank FROM {name} WHERE {name} MATCH :match'.format(
+                name=self._name)
+        ).bindparams(match=self.match_expression(search)).columns(
+            sql_column('rowid', Integer), sql_column('rank', Float)
+        ).alias('fts_match')
+
+
+class FTSSearch(BaseSearch):
+    """
+    Search through a SQLite FTS5 index of the searchable columns, ranked by
+    relevance (bm25) when no sort column is selected. Only columns of the
+    model table can be indexed.
+
+    :param name:
+        FTS table name, `<table>_fts` by default
+    """
+    def __init__(self, name=None):
+        self.name = name
+
+    def setup(self, view, fields):
+        super(FTSSearch, self).setup(view, fields)
+
+        if any(path for _, path in fields):
+            raise Exception('FTS search only supports columns of the model '
+                            'table: {}'.format(view.model.__name__))
+
+        self.index = FTSIndex.get(view.model, [c for c, _ in fields],
+                                  self.name)
+
+    def apply(self, view, query, count_query, joins, count_joins, search,
+              rank=False):
+        if not parse_search_terms(search):
+            return query, count_query, joins, count_joins
+
+        if not self.index._ready:
+            engine = query.session.get_bind(mapper=class_mapper(view.model))
+            if not self.index.ensure(engine):
+                raise Exception('FTS search requires SQLite, {} found'.format(
+                    engine.dialect.name))
+
+        match = self.index.subquery(search)
+        pk = self.index.pk
+
+        query = query.join(match, match.c.rowid == pk)
+        if rank:
+            query = query.order_by(match.c.rank)
+
+        if count_query is not None:
+            count_query = count_query.join(match, match.c.rowid == pk)
+
+        return query, count_query, joins, count_joins
+
+
+SEARCH_BACKENDS = {
+    'like': LikeSearch,
+    'fts': FTSSearch,
+}
+
+
+def get_search_backend(backend):
+    """
+    Return a search backend instance from an instance, a class or one of the
+    names in `SEARCH_BACKENDS`.
+    """
+    if backend is None:
+        return LikeSearch()
+    if isinstance(backend, str):
+        try:
+            backend = SEARCH_BACKENDS[backend]
+        except KeyError:
+            raise ValueError('Unknown search backend: {}'.format(backend))
+    if isinstance(backend, type):
+        return backend()
+    # Backends keep per view state
+    return copy(backend)
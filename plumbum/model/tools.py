@@ -1,18 +1,135 @@
 # -*- coding: utf-8 -*-
 
+import json
 import warnings
-
-from sqlalchemy.orm import class_mapper
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, time
+from enum import Enum
+from functools import wraps
+from operator import attrgetter
+from threading import Lock
+
+from sqlalchemy import and_, event, or_
+from sqlalchemy.orm import (Mapper, class_mapper, joinedload, load_only,
+                            selectinload)
 from sqlalchemy.orm.attributes import InstrumentedAttribute
+from sqlalchemy.orm.exc import UnmappedColumnError
 from sqlalchemy.ext.associationproxy import ASSOCIATION_PROXY
 
 from ..tools import recursive_getattr
 
 
+class ModelMetadata(object):
+    """
+    Process wide cache of model introspection results (columns, join paths,
+    primary keys), shared by every view of a model. It is cleared whenever
+    SQLAlchemy configures mappers, for example when new models are mapped.
+    """
+    def __init__(self):
+        self._cache = {}
+        self._lock = Lock()
+
+    def get(self, key, func, *args):
+        try:
+            return self._cache[key]
+        except KeyError:
+            pass
+
+        value = func(*args)
+
+        with self._lock:
+            return self._cache.setdefault(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+model_metadata = ModelMetadata()
+
+event.listen(Mapper, 'after_configured', model_metadata.clear)
+
+
+def _copy(value):
+    "Copy containers so callers can not change cached results."
+    if isinstance(value, (list, dict, set)):
+        return type(value)(value)
+    if isinstance(value, tuple):
+        return tuple(_copy(v) for v in value)
+    return value
+
+
+def _key(value):
+    if isinstance(value, list):
+        return tuple(value)
+    return value
+
+
+def cached_metadata(func):
+    """
+    Cache the result of `func(model, *args)` in `model_metadata`. Results
+    for unhashable arguments are not cached.
+    """
+    @wraps(func)
+    def wrapper(*args):
+        key = (func.__name__,) + tuple(_key(a) for a in args)
+        try:
+            hash(key)
+        except TypeError:
+            return func(*args)
+        return _copy(model_metadata.get(key, func, *args))
+    return wrapper
+
+
 def get_field_value(model, name):
     return recursive_getattr(model, name)
 
 
+def get_field_accessor(model, name):
+    """
+    Return an `accessor(obj)` callable equivalent to
+    `get_field_value(obj, name)` for instances of `model`, compiled once:
+    the dotted name is split ahead of time and traversal stops at the
+    first `None`, without catching exceptions.
+
+    Names that can not be verified against the model attributes and
+    relationships, or that go through a collection, fall back to
+    `get_field_value`.
+    """
+    parts = name.split('.')
+
+    def fallback(obj):
+        return get_field_value(obj, name)
+
+    current = model
+    for i, part in enumerate(parts):
+        attr = getattr(current, part, None) if current is not None else None
+        if attr is None:
+            return fallback
+
+        if is_relationship(attr):
+            if attr.property.uselist and i < len(parts) - 1:
+                return fallback
+            current = attr.property.mapper.class_
+        elif i < len(parts) - 1:
+            # Plain attribute in the middle of the path, type unknown
+            current = None
+
+    if len(parts) == 1:
+        return attrgetter(name)
+
+    getters = [attrgetter(part) for part in parts]
+
+    def accessor(obj):
+        for getter in getters:
+            obj = getter(obj)
+            if obj is None:
+                return None
+        return obj
+
+    return accessor
+
+
 def column_name(field):
     return field.replace('_', ' ').title()
 
@@ -51,6 +168,7 @@ def column_names(model, only_columns=None, excluded_columns=None,
     return formatted_columns
 
 
+@cached_metadata
 def list_columns(model, display_all_relations=False, display_pk=False):
     "Return a list fo columns from the model."
     columns = []
@@ -62,7 +180,7 @@ def list_columns(model, display_all_relations=False, display_pk=False):
         elif hasattr(prop, 'columns'):
             if len(prop.columns) > 1:
                 filtered = list(filter(lambda c: c.table == model.__table__,
-                                       columns))
+                                       prop.columns))
                 if len(filtered) > 1:
                     warnings.warn("Can not convert multiple-column properties "
                                   "({}.{})".format(model, prop.key))
@@ -80,6 +198,7 @@ def list_columns(model, display_all_relations=False, display_pk=False):
     return columns
 
 
+@cached_metadata
 def sortable_columns(model, display_pk=False):
     "Return a dictionary of sortable columns."
     columns = dict()
@@ -107,6 +226,17 @@ def sortable_columns(model, display_pk=False):
 
 def get_field_with_path(model, name, return_remote_proxy_attr=True):
     "Resolve property by name and figure out its join path"
+    if isinstance(name, str):
+        return _get_field_with_path(model, name, return_remote_proxy_attr)
+    return _resolve_field_with_path(model, name, return_remote_proxy_attr)
+
+
+@cached_metadata
+def _get_field_with_path(model, name, return_remote_proxy_attr):
+    return _resolve_field_with_path(model, name, return_remote_proxy_attr)
+
+
+def _resolve_field_with_path(model, name, return_remote_proxy_attr):
     path = []
 
     # For strings, resolve path
@@ -133,7 +263,7 @@ def get_field_with_path(model, name, return_remote_proxy_attr=True):
 
         attr = value
     else:
-        attr = value
+        attr = name
 
         if isinstance(attr, InstrumentedAttribute) or \
                 is_association_proxy(attr):
@@ -150,6 +280,99 @@ def get_field_with_path(model, name, return_remote_proxy_attr=True):
     return attr, path
 
 
+@cached_metadata
+def get_relationship_path(model, name):
+    """
+    Return the relationship attributes traversed by a dotted column name,
+    including the last one if the column itself is a relationship.
+    """
+    path = []
+
+    if not isinstance(name, str):
+        return path
+
+    current_model = model
+    for attribute in name.split('.'):
+        value = getattr(current_model, attribute, None)
+        if not is_relationship(value):
+            break
+
+        path.append(value)
+        current_model = value.property.mapper.class_
+
+    return path
+
+
+def get_loader_options(model, names):
+    """
+    Return loader options to eagerly load the relationships needed to
+    display the `names` columns: joined loading for many-to-one relations and
+    selectin loading for collections.
+    """
+    options = {}
+
+    for name in names:
+        path = get_relationship_path(model, name)
+
+        option = None
+        for relation in path:
+            prop = relation.property
+            if prop.lazy == 'dynamic':
+                break
+
+            loader = selectinload if prop.uselist else joinedload
+            if option is None:
+                option = loader(relation)
+            else:
+                option = getattr(option, loader.__name__)(relation)
+
+        if option is not None:
+            options.setdefault(tuple(path), option)
+
+    return list(options.values())
+
+
+@cached_metadata
+def get_local_column_keys(model, names):
+    """
+    Return the keys of the `model` column properties needed to display the
+    `names` columns: the columns themselves, the foreign keys of the
+    relationships they go through and the primary key.
+    """
+    mapper = class_mapper(model)
+    keys = [mapper.get_property_by_column(c).key for c in mapper.primary_key]
+
+    def add(key):
+        if key not in keys:
+            keys.append(key)
+
+    for name in names:
+        if isinstance(name, str):
+            key = name.split('.', 1)[0]
+        else:
+            key = getattr(name, 'key', None)
+
+        if key is None or not mapper.has_property(key):
+            continue
+
+        prop = mapper.get_property(key)
+        if hasattr(prop, 'direction'):
+            for column in prop.local_columns:
+                try:
+                    add(mapper.get_property_by_column(column).key)
+                except UnmappedColumnError:
+                    pass
+        elif hasattr(prop, 'columns'):
+            add(prop.key)
+
+    return keys
+
+
+def get_load_only_option(model, keys):
+    "Return a loader option that only loads the `keys` column properties."
+    return load_only(*[getattr(model, key) for key in keys])
+
+
 def get_columns_for_field(field):
     if (not field or
             not hasattr(field, 'property') or
@@ -161,6 +384,7 @@ def get_columns_for_field(field):
     return field.property.columns
 
 
+@cached_metadata
 def get_primary_key(model):
     "Return primary key name from a model"
     mapper = class_mapper(model)
@@ -175,7 +399,13 @@ def get_primary_key(model):
 
 def need_join(model, table):
     "Check if join to a table is necessary."
-    return table not in class_mapper(model).tables
+    return table not in get_mapped_tables(model)
+
+
+@cached_metadata
+def get_mapped_tables(model):
+    "Return the set of tables mapped by `model`."
+    return frozenset(class_mapper(model).tables)
 
 
 def is_relationship(attr):
@@ -185,3 +415,105 @@ def is_relationship(attr):
 def is_association_proxy(attr):
     return hasattr(attr, 'extension_type') and \
            attr.extension_type == ASSOCIATION_PROXY
+
+
+def _cursor_default(value):
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+    return str(value)
+
+
+def _cursor_coerce(column, value):
+    if value is None:
+        return value
+
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+
+    if isinstance(value, python_type):
+        return value
+    if issubclass(python_type, (date, datetime, time)):
+        return python_type.fromisoformat(value)
+    if issubclass(python_type, Enum):
+        return python_type[value]
+    return python_type(value)
+
+
+def encode_cursor(direction, values):
+    """
+    Encode a keyset pagination cursor as an opaque URL safe string.
+
+    :param direction:
+        `'next'` or `'prev'`
+    :param values:
+        Sort and primary key values of the boundary row
+    """
+    data = json.dumps([direction, list(values)], default=_cursor_default,
+                      separators=(',', ':'))
+    return urlsafe_b64encode(data.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, columns):
+    """
+    Decode a cursor generated by `encode_cursor`, coercing values to the
+    python type of `columns`. Return `None` if the cursor is not valid.
+    """
+    try:
+        data = urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, values = json.loads(data.decode('utf-8'))
+
+        if direction not in ('next', 'prev') or len(values) != len(columns):
+            return None
+
+        return direction, [_cursor_coerce(c, v)
+                           for c, v in zip(columns, values)]
+    except (ValueError, TypeError, KeyError):
+        return None
+
+
+def keyset_order(columns, desc=False, nullable=()):
+    """
+    Return the ORDER BY clauses of a keyset. Nullable columns sort their
+    NULL values last (first when `desc`) on every backend.
+    """
+    clauses = []
+    nullable = list(nullable) + [False] * (len(columns) - len(nullable))
+    for column, null in zip(columns, nullable):
+        if null:
+            clauses.append(column.is_(None))
+        clauses.append(column)
+    if desc:
+        clauses = [c.desc() for c in clauses]
+    return clauses
+
+
+def keyset_clause(columns, values, desc=False, nullable=()):
+    """
+    Build the row comparison `(c1, c2, ...) > (v1, v2, ...)` (or `<` when
+    `desc`) expanded to AND/OR, which works on every backend. NULL values
+    of `nullable` columns are ordered as by `keyset_order`.
+    """
+    def equals(column, value):
+        return column.is_(None) if value is None else column == value
+
+    def after(column, value, null):
+        if not null:
+            return column < value if desc else column > value
+        if value is None:
+            return column.isnot(None) if desc else None
+        return column < value if desc else or_(column > value,
+                                               column.is_(None))
+
+    clauses = []
+    nullable = list(nullable) + [False] * (len(columns) - len(nullable))
+    for idx, (column, value) in enumerate(zip(columns, values)):
+        cmp = after(column, value, nullable[idx])
+        if cmp is None:
+            continue
+        clauses.append(and_(*([equals(c, v) for c, v in
+                               zip(columns[:idx], values[:idx])] + [cmp])))
+    return or_(*clauses)
@@ -84,3 +84,31 @@ EXPORT_FORMATTERS = {
     dict: dict_formatter,
     Enum: enum_formatter,
 }
+
+
+class TypeFormatterMap(object):
+    """
+    Resolve the formatter of a value type from a type formatters dictionary.
+
+    The first formatter whose type matches the value wins, like iterating
+    the dictionary with `isinstance`, but the result is cached per exact
+    value type.
+    """
+    def __init__(self, formatters):
+        self.formatters = formatters
+        self._cache = {}
+
+    def get(self, value_type):
+        try:
+            return self._cache[value_type]
+        except KeyError:
+            pass
+
+        formatter = None
+        for typeobj, fmt in self.formatters.items():
+            if issubclass(value_type, typeobj):
+                formatter = fmt
+                break
+
+        self._cache[value_type] = formatter
+        return formatter
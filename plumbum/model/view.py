@@ -1,17 +1,22 @@
 # -*- coding: utf-8 -*-
 
-import csv
 import mimetypes
 import time
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
 from math import ceil
+from threading import RLock, get_ident
 from urllib.parse import urljoin, urlparse
 
-from sqlalchemy import func, Table
+from sqlalchemy import Column, func, Table
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import aliased
 from sqlalchemy.sql.expression import desc
 from werkzeug import secure_filename
-from flask import Response, request, redirect, flash, stream_with_context
+from flask import (Response, request, redirect, flash, stream_with_context,
+                   jsonify, send_file, abort, session, make_response)
+from flask_wtf.csrf import generate_csrf
 from jinja2 import contextfunction
 from wtforms.validators import ValidationError
 
@@ -20,12 +25,26 @@ try:
 except ImportError:
     tablib = None
 
+from ..actions import ActionForm, ActionSelection, ActionsMixin, action
 from ..base import BaseView, expose
-from ..babel import gettext, lazy_gettext
+from ..babel import gettext, lazy_gettext, get_locale
+from ..instrument import phase, timed
+from ..metrics import get_metrics
 from ..form import BaseForm, build_form
-from ..tools import prettify_class_name
+from ..tools import prettify_class_name, set_current_view
 from . import tools
 from . import typefmt
+from .cache import get_default_cache, make_key, model_versions
+from .count import get_count_strategy
+from .export import EXPORT_WRITERS, json_dumps, json_object_stream
+from .filters import BaseFilter, FilterConverter
+from .guard import QueryGuard, get_guard_mode, track_columns
+from .jobs import ExportJobForm, get_default_queue
+from .search import get_search_backend
+
+
+# Stands for the CSRF token of the session in cached pages
+CSRF_PLACEHOLDER = '__plumbum_csrf_token__'
 
 
 def is_safe_url(target):
@@ -42,13 +61,21 @@ def get_redirect_target(param_name='url'):
         return target
 
 
+def _chunk_size(chunk):
+    "Return the size in bytes of an export chunk."
+    if isinstance(chunk, str):
+        return len(chunk.encode('utf-8'))
+    return len(chunk)
+
+
 class ViewArgs(object):
     """
     List view arguments
     """
     def __init__(self, page=None, page_size=None, sort=None, sort_desc=None,
-                 search=None, filters=None, extra_args=None):
+                 search=None, filters=None, extra_args=None, cursor=None):
         self.page = page
+        self.cursor = cursor
         self.page_size = page_size
         self.sort = sort
         self.sort_desc = bool(sort_desc)
@@ -66,6 +93,7 @@ class ViewArgs(object):
             filters = None
 
         kwargs.setdefault('page', self.page)
+        kwargs.setdefault('cursor', self.cursor)
         kwargs.setdefault('page_size', self.page_size)
         kwargs.setdefault('sort', self.sort)
         kwargs.setdefault('sort_desc', self.sort_desc)
@@ -86,7 +114,7 @@ class FilterGroup(object):
         self.filters.append(filter)
 
 
-class ModelView(BaseView):
+class ModelView(BaseView, ActionsMixin):
     """
     SQLAlchemy model view.
     """
@@ -178,6 +206,21 @@ class ModelView(BaseView):
     Map choices to columns in list view
     """
 
+    column_list_projection = False
+    """
+    Only load the primary key, the list columns and the sort column of the
+    model in the list view, leaving out wide columns nobody sees.
+
+    Other attributes are loaded with one query per row when accessed, list
+    the ones read by column formatters in `column_list_projection_extra`.
+    """
+
+    column_list_projection_extra = None
+    """
+    Collection of additional model attributes loaded by the list view when
+    `column_list_projection` is enabled.
+    """
+
     column_display_pk = False
     """
     Controls if the primary key should be displayed in the list view.
@@ -191,21 +234,27 @@ class ModelView(BaseView):
     column_formatters = dict()
     """
     Dictionary of list view columns formatters.
+
+    Formatters are compiled per column when the view is scaffolded, later
+    changes to this dictionary are not seen.
     """
 
     column_formatters_export = None
     """
     Dictionary of list view column formatters to be used for export.
+    Frozen when the view is scaffolded, like `column_formatters`.
     """
 
     column_type_formatters = None
     """
     Dictionary of value type formatters to be used in the list view.
+    Frozen when the view is scaffolded, like `column_formatters`.
     """
 
     column_type_formatters_export = None
     """
     Dictionary of value type formatters to be used in the export.
+    Frozen when the view is scaffolded, like `column_formatters`.
     """
 
     column_labels = None
@@ -228,6 +277,46 @@ class ModelView(BaseView):
     Default sort column if no sorting is applied.
     """
 
+    column_searchable_list = None
+    """
+    Collection of the searchable columns, related columns can be referenced
+    as `'<relationship>.<column>'`. Enables the search box of the list view.
+
+    For example::
+
+        class MyModelView(ModelView):
+            column_searchable_list = ('name', 'email')
+    """
+
+    search_backend = 'like'
+    """
+    Search backend, an instance from `plumbum.model.search` or one of these
+    names:
+
+    * `'like'` matches every term against any column with `ILIKE`, fine for
+      small tables
+    * `'fts'` uses a SQLite FTS5 index of the searchable columns kept in
+      sync by SQLAlchemy events, with relevance ranking
+    """
+
+    column_filters = None
+    """
+    Collection of the column filters. Items are column names, related
+    columns referenced as `'<relationship>.<column>'`, which get the default
+    filters of their type, or filter instances from `plumbum.model.filters`.
+
+    For example::
+
+        class MyModelView(ModelView):
+            column_filters = ('name', 'user.email',
+                              FilterGreater(Post.date, 'Date'))
+    """
+
+    filter_converter = FilterConverter()
+    """
+    Build the default filters of the columns named in `column_filters`.
+    """
+
     column_details_link = None
     """
     Index or name of column where put link to details/edit view.
@@ -307,6 +396,41 @@ class ModelView(BaseView):
     A list of available export filetypes. `csv` only is default. Check tablib.
     """
 
+    export_writers = None
+    """
+    Dictionary of streaming writers by export type, defaults to
+    `plumbum.model.export.EXPORT_WRITERS` (csv, tsv, json, jsonl and xlsx
+    when openpyxl is installed). Other export types use tablib.
+    """
+
+    export_async = False
+    """
+    Run exports as background jobs instead of inside the request. The list
+    view polls the job status and downloads the file once it is ready.
+    """
+
+    export_job_queue = None
+    """
+    `plumbum.model.jobs.ExportJobQueue` used by `export_async`, defaults to
+    a process wide queue configured with the `PLUMBUM_EXPORT_*` settings.
+    """
+
+    can_use_api = False
+    """
+    Serve the JSON API endpoints: `api/` lists rows (with the same
+    pagination, sort, search and filter arguments as the list view),
+    `api/<pk>` returns one row and `api/count/` counts them. Values are
+    formatted as in exports, but only the columns of the list view, or of
+    the details view for `api/<pk>`, are served, `fields` selects a comma
+    separated subset of them.
+    """
+
+    export_chunk_size = 1000
+    """
+    Number of rows fetched at a time from a server side cursor when
+    exporting, so memory does not grow with the table size.
+    """
+
     # Pagination settings
     page_size = 20
     """
@@ -318,16 +442,123 @@ class ModelView(BaseView):
     Allow to select page size via dropdown list
     """
 
+    page_size_options = (20, 50, 100)
+    """
+    Page sizes the user can choose from when `can_set_page_size` is enabled.
+    Any other requested size is ignored and `page_size` is used instead.
+    """
+
     simple_pager = False
     """
     Enable or disable simple list pager (only show prev/next buttons).
     """
 
+    count_strategy = 'exact'
+    """
+    How the list view counts rows. Either a strategy instance from
+    `plumbum.model.count` or one of these names:
+
+    * `'exact'` runs the count query on every request
+    * `'cached'` reuses counts per search and filters for 60 seconds
+    * `'estimated'` uses database statistics for unfiltered lists, exact
+      counts otherwise (and on SQLite)
+    * `'timeboxed'` falls back to the simple pager when counting exceeds
+      half a second
+    * `'events'` keeps unfiltered counts in memory from SQLAlchemy events,
+      see `plumbum.model.count.ModelCounters`
+
+    For example::
+
+        class MyModelView(ModelView):
+            count_strategy = CachedCount(timeout=300)
+    """
+
+    keyset_pagination = False
+    """
+    Use keyset (seek) pagination instead of LIMIT/OFFSET. Pages are addressed
+    by an opaque cursor made of the active sort column and the primary key,
+    so deep pages cost the same as the first one. Only prev/next navigation
+    is available. NULL values of nullable sort columns, and of columns of
+    related models, are sorted last, which is slower to seek on some
+    backends than non nullable columns.
+    """
+
     ignore_hidden = True
     """
     Ignore field that starts with "_"
     """
 
+    lazy_scaffold = False
+    """
+    Defer the model introspection done by `_scaffold` until the view is
+    first used, which speeds up the startup of applications with many
+    views. `Plumbum.warmup` scaffolds pending views ahead of time.
+    """
+
+    eager_load_columns = True
+    """
+    Eagerly load the relationships referenced by list, details and export
+    columns instead of lazy loading them for every row.
+    """
+
+    # Page cache
+    cache_pages = False
+    """
+    Cache the rendered list and details pages. Entries are keyed by view
+    arguments, locale, the menu entries and actions allowed to the current
+    user and `get_cache_context`, and invalidated when a
+    session commits changes to the model or to the related models shown,
+    searched, sorted or filtered by the view.
+
+    Only changes made by this process are seen, entries also expire after
+    `PLUMBUM_PAGE_CACHE_TIMEOUT` seconds (300 by default).
+    """
+
+    page_cache = None
+    """
+    Page cache backend, by default a process wide `LRUCache` holding up to
+    `PLUMBUM_PAGE_CACHE_SIZE` bytes (32MB by default).
+    """
+
+    page_cache_models = None
+    """
+    Collection of additional models whose changes invalidate cached pages,
+    for example models read by column formatters.
+    """
+
+    etag_source = None
+    """
+    Answer conditional GET requests on the list, details and export views
+    with `304 Not Modified`, before querying the rows or rendering. The
+    validators come from:
+
+    * a column name, for example `'updated_at'` or a version counter
+      updated on every change: lists use the values and primary keys of
+      the rows of the requested page, fetched by a second query of the
+      page, details the row value and exports the maximum and the row
+      count of the whole table. Related models, and row counts shown by
+      the pager when only other pages change, are not considered.
+      Timestamp columns (naive UTC) are also sent as `Last-Modified`.
+    * `'versions'`, the change counters of `plumbum.model.cache`, which
+      also see changes to related models, but only those committed by this
+      process.
+    """
+
+    query_budget = None
+    """
+    Maximum number of SQL statements a request of this view should run,
+    checked in debug mode only. `None` uses the `PLUMBUM_QUERY_BUDGET`
+    setting (20 by default).
+
+    The check also reports statements run `PLUMBUM_QUERY_REPEAT` times or
+    more (5 by default), usually lazy loads of a dotted column or of a
+    related model `__str__`, with the list column they were run for.
+    `PLUMBUM_QUERY_GUARD` is `'warn'` (default, or `True`) to issue a
+    `QueryBudgetWarning`, `'raise'` to raise `QueryBudgetExceeded` or
+    `False` to disable the check. These settings are read when the view is
+    registered with the application.
+    """
+
     def __init__(self, model, session, name=None, endpoint=None, url=None,
                  static_folder=None):
         self.model = model
@@ -340,7 +571,91 @@ class ModelView(BaseView):
         super(ModelView, self).__init__(name, endpoint, url, static_folder)
 
         # Scaffolding
-        self._scaffold()
+        self._scaffold_lock = RLock()
+        self._scaffold_thread = None
+
+        if self.lazy_scaffold:
+            self._scaffold_pending = True
+        else:
+            self._scaffold()
+            self._scaffold_pending = False
+
+    def ensure_scaffolded(self):
+        """
+        Scaffold the view if `lazy_scaffold` deferred it. Safe to call from
+        several threads, only one scaffolds. Return `False` if called while
+        the current thread is scaffolding the view.
+        """
+        if not self._scaffold_pending:
+            return True
+
+        with self._scaffold_lock:
+            if self._scaffold_thread is not None:
+                # Reentrant call from _scaffold itself
+                return False
+
+            if self._scaffold_pending:
+                self._scaffold_thread = get_ident()
+                try:
+                    self._scaffold()
+                finally:
+                    self._scaffold_thread = None
+                self._scaffold_pending = False
+
+        return True
+
+    def __getattr__(self, name):
+        # Only reached for missing attributes: scaffolded state of a lazy
+        # view is computed on first access.
+        if name.startswith('_') and not name.startswith('__') and \
+                self.__dict__.get('_scaffold_pending') and \
+                self.ensure_scaffolded():
+            return getattr(self, name)
+        raise AttributeError("'{}' object has no attribute '{}'".format(
+            self.__class__.__name__, name))
+
+    def _handle_view(self, name, **kwargs):
+        self.ensure_scaffolded()
+        return super(ModelView, self)._handle_view(name, **kwargs)
+
+    def create_blueprint(self, plumbum):
+        # Query guard settings are checked once, when the view is registered
+        config = plumbum.app.config
+        mode = get_guard_mode(config.get('PLUMBUM_QUERY_GUARD', 'warn'))
+
+        if mode is None:
+            self._query_guard = None
+        else:
+            budget = self.query_budget
+            if budget is None:
+                budget = config.get('PLUMBUM_QUERY_BUDGET', 20)
+
+            self._query_guard = QueryGuard(
+                budget, config.get('PLUMBUM_QUERY_REPEAT', 5), mode)
+
+        return super(ModelView, self).create_blueprint(plumbum)
+
+    def get_query_guard(self):
+        "Return the `QueryGuard` checking requests, `None` if disabled."
+        app = self.plumbum.app if self.plumbum is not None else None
+        if app is None or not app.debug:
+            return None
+
+        return getattr(self, '_query_guard', None)
+
+    def _run_view(self, fn, *args, **kwargs):
+        guard = self.get_query_guard()
+        if guard is None:
+            return super(ModelView, self)._run_view(fn, *args, **kwargs)
+
+        recorder = guard.start()
+        try:
+            response = super(ModelView, self)._run_view(fn, *args, **kwargs)
+        finally:
+            guard.stop()
+
+        guard.check(self, fn.__name__, recorder)
+        return response
 
     def _scaffold(self):
         "Calculate various instance variables"
@@ -359,18 +674,41 @@ class ModelView(BaseView):
         # Export view
         self._export_columns = self.get_export_columns()
 
+        # Relationship loading
+        self._list_loader_options = self.get_loader_options(
+            self._list_columns)
+        self._details_loader_options = self.get_loader_options(
+            self._details_columns if self.can_view_details else [])
+        self._export_loader_options = self.get_loader_options(
+            self._export_columns)
+
+        if self.column_list_projection:
+            extra = list(self.column_list_projection_extra or ())
+            if self.etag_source and self.etag_source != 'versions':
+                extra.append(self.etag_source)
+
+            self._list_projection = tools.get_local_column_keys(
+                self.model, [c for c, _ in self._list_columns] + extra)
+        else:
+            self._list_projection = None
+
         # Labels
         if self.column_labels is None:
             self.column_labels = {}
 
         # Forms
         self._form_fields = self.get_form_fields()
+        self._form_cache = dict()
 
         # Search
+        self._search_supported = self.init_search()
+
+        # Count
+        self._count_strategy = get_count_strategy(self.count_strategy)
 
         # Choices
         if self.column_choices:
-            self._column_choices = dict([
+            self._column_choices_map = dict([
                 (column, dict(choices))
                 for column, choices in self.column_choices.items()
             ])
@@ -393,12 +731,162 @@ class ModelView(BaseView):
         if self.column_descriptions is None:
             self.column_descriptions = dict()
 
+        # Compiled formatters, one per column
+        self._list_type_formatters = typefmt.TypeFormatterMap(
+            self.column_type_formatters)
+        self._export_type_formatters = typefmt.TypeFormatterMap(
+            self.column_type_formatters_export)
+
+        self._field_accessors = dict()
+        self._list_formatters = dict()
+        self._export_formatters = dict()
+
+        details_columns = self._details_columns if self.can_view_details \
+            else []
+        for name, _ in self._list_columns + details_columns:
+            self._get_list_formatter(name)
+
+        for name, _ in self._export_columns:
+            self._get_export_formatter(name)
+
         # Filters
+        self._filters = self.get_filters()
+        self._filter_groups = self.get_filter_groups()
+        self._filter_args = dict((self.get_filter_arg(i, flt), (i, flt))
+                                 for i, flt in enumerate(self._filters or ()))
+
+        # Actions, they need a single column primary key
+        if isinstance(self._primary_key, tuple):
+            self._actions, self._actions_data = [], {}
+        else:
+            self.init_actions()
+
+        # Page cache and validators
+        if self.etag_source and self.etag_source != 'versions':
+            self._etag_column = getattr(self.model, self.etag_source)
+
+        if self.cache_pages or self.etag_source == 'versions':
+            self._cache_models = self.get_cache_models()
+            for model in self._cache_models:
+                model_versions.register(model)
 
         # Form rendering rules
 
         # Process form rules
 
+    def init_search(self):
+        """
+        Resolve `column_searchable_list` and set up the search backend.
+        Return `True` if search is enabled.
+        """
+        if not self.column_searchable_list:
+            return False
+
+        self._search_fields = []
+
+        for name in self.column_searchable_list:
+            attr, joins = tools.get_field_with_path(self.model, name)
+
+            if not attr:
+                raise Exception('Failed to find field for search field: '
+                                '{}'.format(name))
+
+            for column in tools.get_columns_for_field(attr):
+                self._search_fields.append((column, joins))
+
+        self._search_backend = get_search_backend(self.search_backend)
+        self._search_backend.setup(self, self._search_fields)
+
+        return True
+
+    def get_filters(self):
+        """
+        Resolve `column_filters` into a list of filters, with their columns
+        and join paths, so applying them needs no model introspection.
+        """
+        if not self.column_filters:
+            return None
+
+        filters = []
+
+        for item in self.column_filters:
+            if isinstance(item, BaseFilter):
+                attr, joins = tools.get_field_with_path(self.model,
+                                                        item.column)
+                if not attr:
+                    raise Exception('Failed to find field for filter: '
+                                    '{}'.format(item.column))
+                columns = tools.get_columns_for_field(attr)
+                if len(columns) > 1:
+                    raise Exception('Can not filter more than one column '
+                                    'at once: {}'.format(item.column))
+                item.column = columns[0]
+                item.joins = joins
+                filters.append(item)
+                continue
+
+            attr, joins = tools.get_field_with_path(self.model, item)
+            if not attr:
+                raise Exception('Failed to find field for filter: '
+                                '{}'.format(item))
+
+            for column in tools.get_columns_for_field(attr):
+                flts = self.filter_converter.convert(
+                    column, self.get_column_name(item),
+                    self.column_choices.get(item)
+                )
+                if not flts:
+                    raise Exception('Unsupported filter type for column: '
+                                    '{}'.format(item))
+                for flt in flts:
+                    flt.joins = joins
+                filters.extend(flts)
+
+        return filters
+
+    def get_filter_groups(self):
+        "Return filters grouped by label, in order, for the list template."
+        if not self._filters:
+            return None
+
+        groups = OrderedDict()
+        for i, flt in enumerate(self._filters):
+            label = str(flt.name)
+            if label not in groups:
+                groups[label] = FilterGroup(label)
+            groups[label].append((self.get_filter_arg(i, flt), flt))
+
+        return list(groups.values())
+
+    def get_cache_models(self):
+        "Return the models whose changes invalidate cached pages."
+        models = set([self.model])
+        models.update(self.page_cache_models or ())
+
+        names = [c for c, _ in self._list_columns]
+        if self.can_view_details:
+            names.extend(c for c, _ in self._details_columns)
+
+        for name in names:
+            for attr in tools.get_relationship_path(self.model, name):
+                models.add(attr.property.mapper.class_)
+
+        paths = list(self._sortable_joins.values())
+        if self._search_supported:
+            paths.extend(path for _, path in self._search_fields)
+        paths.extend(flt.joins for flt in self._filters or ())
+
+        for path in paths:
+            for item in path or ():
+                if tools.is_relationship(item):
+                    models.add(item.property.mapper.class_)
+
+        return models
+
+    def get_filter_arg(self, index, flt):
+        "Return the URL argument identifying the filter."
+        return str(index)
+
     # Endpoint
     def _get_endpoint(self, endpoint):
         if endpoint:
@@ -407,16 +895,31 @@ class ModelView(BaseView):
 
     # Forms
     def create_form(self):
+        """
+        Return the form class. Generated classes are cached per locale until
+        the view is scaffolded again, so call `_scaffold` after changing
+        form settings at runtime.
+        """
         if self.form:
             return self.form
 
+        locale = get_locale()
+        key = str(locale) if locale is not None else None
+
+        form_class = self._form_cache.get(key)
+        if form_class is None:
+            form_class = self._form_cache[key] = self.scaffold_form()
+
+        return form_class
+
+    def scaffold_form(self):
+        "Generate the form class from the model and the form settings."
         field_args = {field: {'label': label}
                       for field, label in self._form_fields}
 
         if self.field_args:
             field_args.update(self.field_args)
 
-        # TODO: Caching form creation
         return build_form(
             self.model,
             base_class=self.form_base_class,
@@ -487,8 +990,18 @@ class ModelView(BaseView):
             excluded_columns=self.column_export_exclude_list,
         )
 
+    def get_loader_options(self, columns):
+        """
+        Return the query loader options for the `(name, label)` pairs in
+        `columns`, empty when `eager_load_columns` is disabled.
+        """
+        if not self.eager_load_columns:
+            return []
+        return tools.get_loader_options(self.model, [c for c, _ in columns])
+
     def get_sortable_columns(self):
         self._sortable_joins = dict()
+        self._sortable_paths = dict()
 
         if self.column_sortable_list is None:
             return self.build_sortable_columns()
@@ -499,9 +1012,11 @@ class ModelView(BaseView):
                 if isinstance(c, tuple):
                     column, path = tools.get_field_with_path(self.model, c[1])
                     column_name = c[0]
+                    if isinstance(c[1], str):
+                        self._sortable_paths[column_name] = c[1]
                 else:
                     column, path = tools.get_field_with_path(self.model, c)
-                    column_name = text_type(c)
+                    column_name = str(c)
 
                 if path and hasattr(path[0], 'property'):
                     self._sortable_joins[column_name] = path
@@ -606,6 +1121,116 @@ class ModelView(BaseView):
                                               sort_field, sort_desc)
         return query, joins
 
+    def _get_keyset_columns(self, query, joins, sort_column, sort_desc):
+        """
+        Resolve the keyset used by `keyset_pagination`: the active sort column
+        followed by the primary key columns, as `(path, column, nullable)`
+        tuples where `path` reads the value of a row. Columns of related
+        models are outer joined, so they are always nullable.
+        """
+        sort_field = sort_joins = name = None
+
+        if sort_column is not None:
+            if sort_column in self._sortable_columns:
+                sort_field = self._sortable_columns[sort_column]
+                sort_joins = self._sortable_joins.get(sort_column)
+                name = sort_column
+        else:
+            order = self._get_default_order()
+
+            if order:
+                sort_field, sort_joins, sort_desc = order
+                name = self.column_default_sort
+                if isinstance(name, tuple):
+                    name = name[0]
+                if not isinstance(name, str):
+                    name = name.key
+
+        keys = []
+        if sort_field is not None:
+            query, joins, alias = self._apply_path_joins(query, joins,
+                                                         sort_joins,
+                                                         inner_join=False)
+            column = sort_field if alias is None else \
+                getattr(alias, sort_field.key)
+            if isinstance(sort_field, Column):
+                nullable = sort_field.nullable
+            else:
+                nullable = any(c.nullable for c in
+                               tools.get_columns_for_field(sort_field))
+            nullable = nullable or bool(sort_joins)
+            keys.append((self._sortable_paths.get(name, name), column,
+                         nullable))
+
+        pks = self._primary_key
+        if not isinstance(pks, tuple):
+            pks = (pks,)
+
+        for pk in pks:
+            if pk != name:
+                keys.append((pk, getattr(self.model, pk), False))
+
+        return query, joins, keys, sort_desc
+
+    def _apply_keyset(self, query, keys, sort_desc, cursor):
+        "Apply keyset ordering and cursor criteria"
+        columns = [column for _, column, _ in keys]
+        nullable = [n for _, _, n in keys]
+        direction = 'next'
+
+        if cursor is not None:
+            cursor = tools.decode_cursor(cursor, columns)
+
+        if cursor is not None:
+            direction, values = cursor
+            query = query.filter(tools.keyset_clause(
+                columns, values, sort_desc != (direction == 'prev'), nullable
+            ))
+
+        query = query.order_by(*tools.keyset_order(
+            columns, sort_desc != (direction == 'prev'), nullable))
+
+        return query, cursor is not None, direction
+
+    def _set_keyset_cursors(self, data, keys, direction, has_cursor,
+                            has_more):
+        """
+        Contribute `prev_cursor` and `next_cursor` to the template for the
+        page in `data`.
+        """
+        if direction == 'prev':
+            data.reverse()
+            has_prev, has_next = has_more, True
+        else:
+            has_prev, has_next = has_cursor, has_more
+
+        def cursor(direction, row):
+            return tools.encode_cursor(direction, [
+                self._get_field_accessor(path)(row) for path, _, _ in keys
+            ])
+
+        self._template_args['prev_cursor'] = \
+            cursor('prev', data[0]) if data and has_prev else None
+        self._template_args['next_cursor'] = \
+            cursor('next', data[-1]) if data and has_next else None
+
+    def _get_list_projection(self, sort_column):
+        "Return the load_only option for the list query, if enabled."
+        if self._list_projection is None:
+            return None
+
+        if sort_column is None and self.column_default_sort:
+            sort_column = self.column_default_sort
+            if isinstance(sort_column, tuple):
+                sort_column = sort_column[0]
+
+        keys = self._list_projection
+        if sort_column is not None:
+            keys = keys + [key for key in tools.get_local_column_keys(
+                self.model, [sort_column]) if key not in keys]
+
+        return tools.get_load_only_option(self.model, keys)
+
     def _apply_path_joins(self, query, joins, path, inner_join=True):
         last = None
         if path:
@@ -631,6 +1256,15 @@ class ModelView(BaseView):
 
         return query, joins, last
 
+    def _apply_pagination(self, query, page, page_size):
+        if page_size:
+            query = query.limit(page_size)
+
+        if page and page_size:
+            query = query.offset(page * page_size)
+
+        return query
+
     def get_pk_value(self, model):
         """
         Return the primary key value form a model object.
@@ -640,10 +1274,42 @@ class ModelView(BaseView):
         else:
             return getattr(model, self._primary_key)
 
+    def _apply_filters(self, query, joins, filters):
+        if filters and self._filters:
+            for idx, flt_name, value in filters:
+                flt = self._filters[idx]
+
+                query, joins, alias = self._apply_path_joins(
+                    query, joins, flt.joins, inner_join=False)
+                query = flt.apply(query, flt.clean(value), alias)
+
+        return query, joins
+
+    def _apply_search_filters(self, query, search, filters):
+        "Apply search and filters to a single query."
+        joins = {}
+
+        if self._search_supported and search:
+            query, _, joins, _ = self._search_backend.apply(
+                self, query, None, joins, {}, search)
+
+        return self._apply_filters(query, joins, filters)
+
+    def get_count(self, search, filters):
+        "Return the number of rows matching `search` and `filters`."
+        query, _ = self._apply_search_filters(self.get_count_query(), search,
+                                              filters)
+        return self._count_strategy.count(self, query, search, filters)
+
     def get_list(self, page, sort_column, sort_desc, search, filters,
-                 page_size=None):
+                 page_size=None, cursor=None, execute=True):
         """
         Return a paginated list and sorted list of model from the data source.
+
+        When `keyset_pagination` is enabled `page` is ignored and `cursor`
+        selects the page instead. If `execute` is `False` the rows are not
+        counted and the query is returned instead of the rows, without list
+        loader options.
         """
 
         # Will contain join paths with optional aliased object
@@ -651,30 +1317,96 @@ class ModelView(BaseView):
         count_joins = {}
 
         query = self.get_query()
-        count_query = self.get_count_query() if not self.simple_pager else None
+        if execute and not self.simple_pager:
+            count_query = self.get_count_query()
+        else:
+            count_query = None
 
         # Apply search criteria
+        if self._search_supported and search:
+            # Rank by relevance unless the user picked a sort column
+            rank = sort_column is None and not self.keyset_pagination
+            query, count_query, joins, count_joins = \
+                self._search_backend.apply(self, query, count_query, joins,
+                                           count_joins, search, rank=rank)
 
         # Apply filters
+        query, joins = self._apply_filters(query, joins, filters)
+        if count_query is not None:
+            count_query, count_joins = self._apply_filters(
+                count_query, count_joins, filters)
 
         # Calculate number of rows if necessary
-        count = count_query.scalar() if count_query else None
+        if count_query is not None:
+            metrics = get_metrics()
+            start = time.perf_counter()
+
+            with phase('count'):
+                count = self._count_strategy.count(self, count_query, search,
+                                                   filters)
+
+            if metrics is not None:
+                metrics.observe('plumbum_count_query_duration_seconds',
+                                (('view', self.endpoint),),
+                                time.perf_counter() - start)
+        else:
+            count = None
 
         # Apply auto join
 
         # Apply sorting
-        query, joins = self._apply_sorting(query, joins, sort_column, sort_desc)
+        if self.keyset_pagination:
+            query, joins, keys, sort_desc = self._get_keyset_columns(
+                query, joins, sort_column, sort_desc
+            )
+            query, has_cursor, direction = self._apply_keyset(
+                query, keys, sort_desc, cursor
+            )
+            page = None
+        else:
+            query, joins = self._apply_sorting(query, joins, sort_column,
+                                               sort_desc)
 
         # Apply pagination
+        if page_size is None:
+            page_size = self.page_size
+
+        query = self._apply_pagination(query, page, page_size)
+
+        if not execute:
+            return count, query
+
+        query = query.options(*self._list_loader_options)
+
+        projection = self._get_list_projection(sort_column)
+        if projection is not None:
+            query = query.options(projection)
 
         # Excecute
-        query = query.all()
+        if (count is None or self.keyset_pagination) and page_size:
+            # Fetch one extra row to know if there is a next page without
+            # counting the whole table. The result is contributed to the
+            # template as `has_next` (or as keyset cursors).
+            with phase('query'):
+                data = query.limit(page_size + 1).all()
+            has_more = len(data) > page_size
+            data = data[:page_size]
+
+            if self.keyset_pagination:
+                self._set_keyset_cursors(data, keys, direction, has_cursor,
+                                         has_more)
+            else:
+                self._template_args['has_next'] = has_more
+        else:
+            with phase('query'):
+                data = query.all()
 
-        return count, query
+        return count, data
 
     def get_one(self, id):
         "Return one model by its id."
-        return self.session.query(self.model).get(id)
+        query = self.session.query(self.model)
+        return query.options(*self._details_loader_options).get(id)
 
     def handle_view_exception(self, exc):
         if isinstance(exc, IntegrityError):
@@ -717,23 +1449,319 @@ class ModelView(BaseView):
 
     def delete_model(self, model):
         "Delete model"
-        raise NotImplementedError()
+        try:
+            self.session.delete(model)
+            self.session.commit()
+        except Exception as ex:
+            if not self.handle_view_exception(ex):
+                flash(gettext('Failed to delete record. %(error)s', error=ex),
+                      'error')
+
+            self.session.rollback()
+            return False
+
+        return True
+
+    # Actions
+    def is_action_allowed(self, name):
+        if name == 'delete' and not self.can_delete:
+            return False
+        return super(ModelView, self).is_action_allowed(name)
+
+    def get_action_selection(self, form):
+        """
+        Return the selected rows, or all the rows matching the search and
+        filters of the list URL the action was posted from.
+        """
+        if form.select_all.data:
+            view_args = self._get_list_extra_args()
+            query, _ = self._apply_search_filters(
+                self.get_query(), view_args.search, view_args.filters)
+            return ActionSelection(self, query=query,
+                                   chunk_size=self.action_chunk_size)
+
+        pk = getattr(self.model, self._primary_key)
+        try:
+            python_type = pk.type.python_type
+        except NotImplementedError:
+            python_type = str
+
+        ids = []
+        for value in request.form.getlist('rowid'):
+            try:
+                ids.append(python_type(value))
+            except ValueError:
+                pass
+
+        return ActionSelection(self, ids=ids,
+                               chunk_size=self.action_chunk_size)
+
+    @action('delete', lazy_gettext('Delete'),
+            lazy_gettext('Are you sure you want to delete selected records?'))
+    def action_delete(self, selection):
+        try:
+            count = selection.delete()
+            self.session.commit()
+        except Exception as ex:
+            if not self.handle_view_exception(ex):
+                flash(gettext('Failed to delete records. %(error)s',
+                              error=ex), 'error')
+
+            self.session.rollback()
+            return None
+
+        return count
 
     # Various helpers
     @property
     def empty_list_message(self):
         return gettext('There are no items in the table.')
 
+    # Page cache
+    def get_cache_context(self):
+        """
+        Return a hashable value added to page cache keys. The menu entries
+        and actions allowed to the current user are already part of the
+        key, override it when pages differ between users in other ways,
+        for example to return the current user role or id.
+        """
+        return None
+
+    def _get_access_context(self):
+        "Return the access decisions rendered in pages, as a hashable value."
+        def entries(menu):
+            return tuple((e.url, entries(e.children)) for e in menu)
+
+        menu = entries(self.plumbum.resolve_menu(self))
+        if self.sub_menu:
+            menu += entries(self.plumbum.resolve_menu(self, self.sub_menu))
+
+        actions = tuple(name for name, _ in self.get_actions_list()[0])
+        return menu, actions
+
+    def get_page_cache(self):
+        return self.page_cache or get_default_cache(self.plumbum.app)
+
+    def _get_page_cache_key(self, name, *args):
+        """
+        Return the cache key of a page, or `None` if it can not be cached.
+        Pages are not cached while flashed messages are pending, as they
+        are rendered in the page.
+        """
+        if not self.cache_pages or '_flashes' in session:
+            return None
+
+        return make_key(self._get_page_context(name, args),
+                        model_versions.get_key(self._cache_models))
+
+    def _get_page_context(self, name, args):
+        locale = get_locale()
+        return (self.endpoint, name, args, request.url_root,
+                str(locale) if locale is not None else None,
+                self._get_access_context(), self.get_cache_context())
+
+    def _has_csrf_token(self):
+        "Return `True` if pages hold the CSRF token of the session."
+        return bool(self._actions) or self._can_export_async()
+
+    def _get_cached_page(self, key):
+        if key is not None:
+            page = self.get_page_cache().get(key)
+
+            metrics = get_metrics()
+            if metrics is not None:
+                metrics.cache('page', page is not None)
+
+            if page is not None and CSRF_PLACEHOLDER in page:
+                page = page.replace(CSRF_PLACEHOLDER, generate_csrf())
+
+            return page
+
+    def _set_cached_page(self, key, page):
+        if key is not None:
+            # Pages are shared between sessions, the action and export
+            # forms get the CSRF token of the session when served
+            cached = page
+            if self._has_csrf_token():
+                cached = cached.replace(generate_csrf(), CSRF_PLACEHOLDER)
+            self.get_page_cache().set(key, cached)
+        return page
+
+    # Conditional requests
+    def get_etag_data(self, pk=None, query=None, models=None):
+        """
+        Return `(version, last_modified)` of the `pk` row, of the rows of the
+        page `query`, of the page `models` already loaded or of the whole
+        table. `last_modified` may be `None`.
+        """
+        if self.etag_source == 'versions':
+            return model_versions.get_key(self._cache_models), None
+
+        column = self._etag_column
+        mapper = self.model.__mapper__
+
+        if pk is not None:
+            value = version = self.session.query(column).filter(
+                getattr(self.model, self._primary_key) == pk
+            ).scalar()
+        elif query is not None or models is not None:
+            # Only the page rows, their keys also change when rows move in
+            # or out of the page
+            if models is None:
+                rows = query.with_entities(column, *mapper.primary_key)
+            else:
+                keys = [self.etag_source] + [
+                    mapper.get_property_by_column(c).key
+                    for c in mapper.primary_key]
+                rows = ([getattr(m, key) for key in keys] for m in models)
+
+            # Sorted by key, pages read backwards are reversed
+            version = tuple(sorted((tuple(row) for row in rows),
+                                   key=lambda row: row[1:]))
+            values = [row[0] for row in version if row[0] is not None]
+            value = max(values) if values else None
+        else:
+            value, count = self.session.query(
+                func.max(column), func.count()
+            ).select_from(self.model).one()
+            version = (value, count)
+
+        if not isinstance(value, datetime):
+            value = None
+
+        return version, value
+
+    def _get_page_query(self, view_args):
+        "Return the query of the list page selected by `view_args`."
+        sort_column = self._get_column_by_idx(view_args.sort)
+        if sort_column is not None:
+            sort_column = sort_column[0]
+
+        return self.get_list(view_args.page, sort_column,
+                             view_args.sort_desc, view_args.search,
+                             view_args.filters,
+                             page_size=view_args.page_size or self.page_size,
+                             cursor=view_args.cursor, execute=False)[1]
+
+    def _get_validators(self, name, pk=None, view_args=None, models=None):
+        """
+        Return the `(etag, last_modified)` validators of the current request,
+        or `None` if conditional requests are disabled. Like cached pages,
+        responses with pending flashed messages have no validators.
+
+        List validators of a column `etag_source` are read from the page
+        `models` when given, otherwise the page is queried for them.
+        """
+        if not self.etag_source or '_flashes' in session:
+            return None
+
+        if models is not None:
+            version, last_modified = self.get_etag_data(models=models)
+        elif view_args is not None and self.etag_source != 'versions':
+            version, last_modified = self.get_etag_data(
+                query=self._get_page_query(view_args))
+        else:
+            version, last_modified = self.get_etag_data(pk)
+        args = tuple(sorted(request.args.items(multi=True)))
+
+        return (make_key(self._get_page_context(name, args), version),
+                last_modified)
+
+    def _not_modified(self, validators):
+        "Return a `304 Not Modified` response if the client copy is fresh."
+        if validators is None:
+            return None
+
+        etag, last_modified = validators
+
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        elif last_modified is not None and request.if_modified_since:
+            fresh = last_modified.replace(microsecond=0) <= \
+                request.if_modified_since
+        else:
+            fresh = False
+
+        metrics = get_metrics()
+        if metrics is not None:
+            metrics.cache('etag', fresh)
+
+        if fresh:
+            return self._set_validators(Response(status=304), validators)
+
+    def _set_validators(self, response, validators):
+        response = make_response(response)
+
+        if validators is not None:
+            etag, last_modified = validators
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Pages depend on the session, revalidate them every time
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+
+        return response
+
     # URL generation helpers
-    def _get_list_extra_args(self):
-        "Return arguments from query string"
+    def _get_list_extra_args(self, errors=None):
+        """
+        Return arguments from query string. Invalid filter values are
+        flashed, or appended to `errors` if given.
+        """
         args = request.args
-        return ViewArgs(page=args.get('page', 0, type=int),
-                        page_size=args.get('page_size', 0, type=int),
+
+        page = max(args.get('page', 0, type=int), 0)
+
+        page_size = args.get('page_size', 0, type=int)
+        if not self.can_set_page_size or \
+                page_size not in self.page_size_options:
+            page_size = 0
+
+        if self.keyset_pagination:
+            cursor, page = args.get('cursor', None), 0
+        else:
+            cursor = None
+
+        return ViewArgs(page=page,
+                        cursor=cursor,
+                        page_size=page_size,
                         sort=args.get('sort', None, type=int),
                         sort_desc=args.get('desc', None, type=int),
                         search=args.get('search', None),
-                        filters=None)
+                        filters=self._get_list_filter_args(errors))
+
+    def _get_list_filter_args(self, errors=None):
+        """
+        Return active filters as `(index, name, value)` tuples, read from
+        `flt<position>_<filter arg>` URL arguments and sorted by position.
+        Invalid values are flashed, or appended to `errors` if given.
+        """
+        if not self._filters:
+            return None
+
+        filters = []
+
+        for arg, value in request.args.items():
+            if not arg.startswith('flt'):
+                continue
+
+            pos, _, key = arg[3:].partition('_')
+            if key not in self._filter_args or not pos.isdigit():
+                continue
+
+            idx, flt = self._filter_args[key]
+            if flt.validate(value):
+                filters.append((int(pos), (idx, str(flt.name), value)))
+            else:
+                message = gettext('Invalid filter value: %(value)s',
+                                  value=value)
+                if errors is None:
+                    flash(message, 'error')
+                else:
+                    errors.append(message)
+
+        return [f for _, f in sorted(filters, key=lambda f: f[0])]
 
     def _get_filters(self, filters):
         "Get active filters as dictionary of URL arguments and values"
@@ -748,13 +1776,20 @@ class ModelView(BaseView):
                 kwargs[key] = value
         return kwargs
 
+    def _get_active_filters(self, filters):
+        "Return `(URL argument, filter, value)` of the active filters."
+        return [('flt{}_{}'.format(i, self.get_filter_arg(idx,
+                                                          self._filters[idx])),
+                 self._filters[idx], value)
+                for i, (idx, _, value) in enumerate(filters or ())]
+
     def _get_list_url(self, view_args):
         "Generate page URL with current page, sort columns, etc."
         page = view_args.page or None
         desc = 1 if view_args.sort_desc else None
 
-        kwargs = dict(page=page, sort=view_args.sort, desc=desc,
-                      search=view_args.search)
+        kwargs = dict(page=page, cursor=view_args.cursor, sort=view_args.sort,
+                      desc=desc, search=view_args.search)
         kwargs.update(view_args.extra_args)
 
         if view_args.page_size:
@@ -764,14 +1799,84 @@ class ModelView(BaseView):
 
         return self.get_url('.index_view', **kwargs)
 
+    def _compile_formatter(self, name, column_formatters, type_formatters,
+                           column_type_formatters):
+        """
+        Return a `formatter(context, model)` callable with the same result as
+        `_get_list_value` for the `name` column. Views overriding
+        `_get_list_value` get a formatter calling it.
+        """
+        if type(self)._get_list_value is not ModelView._get_list_value:
+            def formatter(context, model):
+                return self._get_list_value(context, model, name,
+                                            column_formatters,
+                                            column_type_formatters)
+            return formatter
+
+        column_fmt = column_formatters.get(name)
+        choices_map = self._column_choices_map.get(name)
+        get_type_fmt = type_formatters.get
+        get_value = self._get_field_accessor(name)
+
+        if choices_map:
+            if column_fmt is not None:
+                def formatter(context, model):
+                    value = column_fmt(self, context, model, name)
+                    return choices_map.get(value) or value
+            else:
+                def formatter(context, model):
+                    value = get_value(model)
+                    return choices_map.get(value) or value
+        elif column_fmt is not None:
+            def formatter(context, model):
+                value = column_fmt(self, context, model, name)
+                type_fmt = get_type_fmt(type(value))
+                return value if type_fmt is None else type_fmt(self, value)
+        else:
+            def formatter(context, model):
+                value = get_value(model)
+                type_fmt = get_type_fmt(type(value))
+                return value if type_fmt is None else type_fmt(self, value)
+
+        return formatter
+
+    def _get_field_accessor(self, name):
+        "Return the compiled attribute accessor of the `name` column."
+        accessor = self._field_accessors.get(name)
+        if accessor is None:
+            accessor = self._field_accessors[name] = \
+                tools.get_field_accessor(self.model, name)
+        return accessor
+
+    def _get_list_formatter(self, name):
+        formatter = self._list_formatters.get(name)
+        if formatter is None:
+            formatter = self._list_formatters[name] = self._compile_formatter(
+                name, self.column_formatters, self._list_type_formatters,
+                self.column_type_formatters)
+        return formatter
+
+    def _get_export_formatter(self, name):
+        formatter = self._export_formatters.get(name)
+        if formatter is None:
+            formatter = self._export_formatters[name] = \
+                self._compile_formatter(name, self.column_formatters_export,
+                                        self._export_type_formatters,
+                                        self.column_type_formatters_export)
+        return formatter
+
     def _get_list_value(self, context, model, name, column_formatters,
                         column_type_formatters):
-        "Returns the value to be displayed"
+        """
+        Returns the value to be displayed. Values are formatted by compiled
+        per column formatters with the same result, this method is only
+        called when a subclass overrides it.
+        """
         column_fmt = column_formatters.get(name)
         if column_fmt is not None:
             value = column_fmt(self, context, model, name)
         else:
-            value = tools.get_field_value(model, name)
+            value = self._get_field_accessor(name)(model)
 
         choices_map = self._column_choices_map.get(name, {})
         if choices_map:
@@ -790,25 +1895,17 @@ class ModelView(BaseView):
     @contextfunction
     def get_list_value(self, context, model, name):
         "Returns the value to be displayed in the list view"
-        return self._get_list_value(
-            context,
-            model,
-            name,
-            self.column_formatters,
-            self.column_type_formatters,
-        )
+        return self._get_list_formatter(name)(context, model)
+
+    def _get_template_value_function(self):
+        "Return `get_list_value`, wrapped to time and check formatting."
+        return track_columns(timed('format', self.get_list_value))
 
     def get_export_value(self, model, name):
         """
         Returns the value to be displayed in export.
         """
-        return self._get_list_value(
-            None,
-            model,
-            name,
-            self.column_formatters_export,
-            self.column_type_formatters_export,
-        )
+        return self._get_export_formatter(name)(None, model)
 
     # Views
     @expose('/')
@@ -817,6 +1914,33 @@ class ModelView(BaseView):
         # Grab parameters form URL
         view_args = self._get_list_extra_args()
 
+        # Column validators come from the rows of the page, they are only
+        # queried ahead to answer conditional requests
+        from_rows = self.etag_source not in (None, 'versions') and \
+            not (request.if_none_match or request.if_modified_since)
+
+        if from_rows:
+            validators = None
+        else:
+            validators = self._get_validators('index_view',
+                                              view_args=view_args)
+        not_modified = self._not_modified(validators)
+        if not_modified is not None:
+            return not_modified
+
+        cache_key = self._get_page_cache_key(
+            'index_view', view_args.page, view_args.cursor,
+            view_args.page_size, view_args.sort, view_args.sort_desc,
+            view_args.search, tuple(map(tuple, view_args.filters or ())),
+            tuple(sorted(view_args.extra_args.items()))
+        )
+        cached = self._get_cached_page(cache_key)
+        if cached is not None:
+            if from_rows:
+                validators = self._get_validators('index_view',
+                                                  view_args=view_args)
+            return self._set_validators(cached, validators)
+
         # Map column index to column name
         sort_column = self._get_column_by_idx(view_args.sort)
         if sort_column is not None:
@@ -828,10 +1952,16 @@ class ModelView(BaseView):
         # Get count and data
         count, data = self.get_list(view_args.page, sort_column,
                                     view_args.sort_desc, view_args.search,
-                                    view_args.filters, page_size=page_size)
+                                    view_args.filters, page_size=page_size,
+                                    cursor=view_args.cursor)
+
+        if from_rows:
+            validators = self._get_validators('index_view', models=data)
 
         # Calculate number of pages
-        if count is not None and page_size:
+        if self.keyset_pagination:
+            num_pages = None  # use cursor pager
+        elif count is not None and page_size:
             num_pages = int(ceil(count / float(page_size)))
         elif not page_size:
             num_pages = 0  # hide pager for unlimited page_size
@@ -842,9 +1972,23 @@ class ModelView(BaseView):
             if not desc and invert and not view_args.sort_desc:
                 desc = 1
 
-            return self._get_list_url(view_args.clone(sort=column, sort_desc=desc))
+            return self._get_list_url(view_args.clone(sort=column,
+                                                      sort_desc=desc,
+                                                      cursor=None))
+
+        def page_url(page):
+            return self._get_list_url(view_args.clone(page=page))
+
+        def cursor_url(cursor):
+            return self._get_list_url(view_args.clone(cursor=cursor))
+
+        def page_size_url(size):
+            return self._get_list_url(view_args.clone(page=0, cursor=None,
+                                                      page_size=size))
 
-        return self.render(
+        actions, actions_confirmation = self.get_actions_list()
+
+        page = self._set_cached_page(cache_key, self.render(
             self.list_template,
             data=data,
 
@@ -857,17 +2001,40 @@ class ModelView(BaseView):
             num_pages=num_pages,
             page=view_args.page,
             page_size=page_size,
+            page_url=page_url,
+            cursor_url=cursor_url,
+            page_size_url=page_size_url,
 
             # Sorting
             sort_column=view_args.sort,
             sort_desc=view_args.sort_desc,
             sort_url=sort_url,
 
+            # Search
+            search_supported=self._search_supported,
+            search=view_args.search,
+            clear_search_url=self._get_list_url(view_args.clone(
+                page=0, cursor=None, search=None)),
+
+            # Filters
+            filter_groups=self._filter_groups,
+            active_filters=self._get_active_filters(view_args.filters),
+            clear_filters_url=self._get_list_url(view_args.clone(
+                page=0, cursor=None, filters=None)),
+
+            # Actions
+            actions=actions,
+            actions_confirmation=actions_confirmation,
+            action_form=ActionForm() if actions else None,
+            export_job_form=ExportJobForm() if self._can_export_async()
+            else None,
+
             # Misc
             get_pk_value=self.get_pk_value,
-            get_value=self.get_list_value,
+            get_value=self._get_template_value_function(),
             return_url=self._get_list_url(view_args),
-        )
+        ))
+        return self._set_validators(page, validators)
 
     @expose('/new/', methods=('GET', 'POST'))
     def create_view(self):
@@ -921,6 +2088,16 @@ class ModelView(BaseView):
         if pk is None:
             return redirect(return_url)
 
+        validators = self._get_validators('details_view', pk)
+        not_modified = self._not_modified(validators)
+        if not_modified is not None:
+            return not_modified
+
+        cache_key = self._get_page_cache_key('details_view', pk, return_url)
+        cached = self._get_cached_page(cache_key)
+        if cached is not None:
+            return self._set_validators(cached, validators)
+
         model = self.get_one(pk)
 
         if model is None:
@@ -929,11 +2106,136 @@ class ModelView(BaseView):
 
         template = self.details_template
 
-        return self.render(template,
-                           model=model,
-                           details_columns=self._details_columns,
-                           get_value=self.get_list_value,
-                           return_url=return_url)
+        page = self._set_cached_page(cache_key, self.render(
+            template,
+            model=model,
+            details_columns=self._details_columns,
+            get_value=self._get_template_value_function(),
+            return_url=return_url))
+        return self._set_validators(page, validators)
+
+    @expose('/action/', methods=('POST',))
+    def action_view(self):
+        "Run a list action"
+        return_url = get_redirect_target() or self.get_url('.index_view')
+        return self.handle_action(return_url)
+
+    # JSON API
+    def _get_api_fields(self, columns):
+        """
+        Return the column names selected by the `fields` argument, all
+        `columns` by default. Raise `ValueError` on unknown names.
+        """
+        names = [c for c, _ in columns]
+
+        fields = request.args.get('fields')
+        if not fields:
+            return names
+
+        fields = [f.strip() for f in fields.split(',') if f.strip()]
+        for field in fields:
+            if field not in names:
+                raise ValueError('Unknown field: {}'.format(field))
+
+        return fields
+
+    def _api_item(self, model, fields):
+        "Return the export values of `model` by field name."
+        item = dict((name, self._get_export_formatter(name)(None, model))
+                    for name in fields)
+        if not isinstance(self._primary_key, tuple):
+            item['_pk'] = getattr(model, self._primary_key)
+        return item
+
+    def _api_error(self, message, status=400):
+        response = jsonify(error=message)
+        response.status_code = status
+        return response
+
+    @expose('/api/')
+    def api_list_view(self):
+        """
+        List rows as JSON. The response is generated one row at a time, so
+        large pages do not build the whole document in memory.
+        """
+        if not self.can_use_api:
+            abort(404)
+
+        try:
+            fields = self._get_api_fields(self._list_columns)
+        except ValueError as ex:
+            return self._api_error(str(ex))
+
+        # Flashed messages would show up in the next page of the session
+        errors = []
+        view_args = self._get_list_extra_args(errors)
+        if errors:
+            return self._api_error(' '.join(errors))
+
+        # Sort by column name as well as by index
+        sort = request.args.get('sort')
+        if sort and view_args.sort is None:
+            for i, (name, _) in enumerate(self._list_columns):
+                if name == sort:
+                    view_args.sort = i
+
+        sort_column = self._get_column_by_idx(view_args.sort)
+        if sort_column is not None:
+            sort_column = sort_column[0]
+
+        page_size = view_args.page_size or self.page_size
+
+        count, data = self.get_list(view_args.page, sort_column,
+                                    view_args.sort_desc, view_args.search,
+                                    view_args.filters, page_size=page_size,
+                                    cursor=view_args.cursor)
+
+        head = OrderedDict([('count', count), ('page_size', page_size)])
+        if self.keyset_pagination:
+            head['prev_cursor'] = self._template_args.get('prev_cursor')
+            head['next_cursor'] = self._template_args.get('next_cursor')
+        else:
+            head['page'] = view_args.page
+            if count is None:
+                head['has_next'] = self._template_args.get('has_next')
+
+        items = (self._api_item(model, fields) for model in data)
+
+        return Response(stream_with_context(json_object_stream(head, 'items',
+                                                               items)),
+                        mimetype='application/json')
+
+    @expose('/api/<int:pk>')
+    def api_details_view(self, pk):
+        "Return one row as JSON."
+        if not self.can_use_api or not self.can_view_details:
+            abort(404)
+
+        try:
+            fields = self._get_api_fields(self._details_columns)
+        except ValueError as ex:
+            return self._api_error(str(ex))
+
+        model = self.get_one(pk)
+        if model is None:
+            return self._api_error(gettext('Record does not exist.'), 404)
+
+        return Response(json_dumps(self._api_item(model, fields)),
+                        mimetype='application/json')
+
+    @expose('/api/count/')
+    def api_count_view(self):
+        "Count the rows matching the search and filter arguments."
+        if not self.can_use_api:
+            abort(404)
+
+        errors = []
+        view_args = self._get_list_extra_args(errors)
+        if errors:
+            return self._api_error(' '.join(errors))
+
+        return jsonify(count=self.get_count(view_args.search,
+                                            view_args.filters))
 
     # Exports
     @expose('/export/<export_type>/')
@@ -944,39 +2246,52 @@ class ModelView(BaseView):
             flash(gettext('Permission denied.'), 'error')
             return redirect(return_url)
 
-        if export_type == 'csv':
-            return self._export_csv(return_url)
+        validators = self._get_validators('export_' + export_type)
+        not_modified = self._not_modified(validators)
+        if not_modified is not None:
+            return not_modified
+
+        writer = self.get_export_writer(export_type)
+        if writer is not None:
+            response = self._export_stream(export_type, writer)
         else:
-            return self._export_tablib(export_type, return_url)
+            response = self._export_tablib(export_type, return_url)
 
-    def _export_csv(self, return_url):
-        "Export a CSV of records as a stream."
-        count, data = self._export_data()
+        if response.status_code != 200:
+            return response
+        return self._set_validators(response, validators)
+
+    def get_export_writer(self, export_type):
+        "Return the streaming writer for `export_type`, if any."
+        writers = self.export_writers
+        if writers is None:
+            writers = EXPORT_WRITERS
+        return writers.get(export_type)
 
-        class Echo(object):
-            def write(self, value):
-                return value
+    def _export_rows(self, data):
+        "Yield the list of export values of each row."
+        columns = [c[0] for c in self._export_columns]
 
-        writer = csv.writer(Echo())
+        for row in data:
+            yield [self.get_export_value(row, c) for c in columns]
 
-        def generate():
-            titles = [c[1] for c in self._export_columns]
-            yield writer.writerow(titles)
+    def _export_stream(self, export_type, writer):
+        "Export records as a stream generated by `writer`."
+        count, data = self._export_data()
 
-            for row in data:
-                vals = [self.get_export_value(row, c[0])
-                        for c in self._export_columns]
-                yield writer.writerow(vals)
+        titles = [str(c[1]) for c in self._export_columns]
 
-        filename = self.get_export_filename(export_type='csv')
+        filename = self.get_export_filename(export_type=export_type)
         disposition = 'attachment;filename={}'.format(
             secure_filename(filename)
         )
 
         return Response(
-            stream_with_context(generate()),
+            stream_with_context(self._export_chunks(export_type, writer,
+                                                    titles,
+                                                    self._export_rows(data))),
             headers={'Content-Disposition': disposition},
-            mimetype='text/csv'
+            mimetype=writer.mimetype
         )
 
     def _export_tablib(self, export_type, return_url):
@@ -998,23 +2313,14 @@ class ModelView(BaseView):
         if encoding:
             mimetype = '{}; charset={}'.format(mimetype, encoding)
 
-        ds = tablib.Dataset(headers=[str(c[1]) for c in self._export_columns])
-
         count, data = self._export_data()
 
-        for row in data:
-            vals = [self.get_export_value(row, c[0])
-                    for c in self._export_columns]
-            ds.append(vals)
-
         try:
-            try:
-                response_data = ds.export(format=export_type)
-            except AttributeError:
-                response_data = getattr(ds, export_type)
+            response_data = self._get_tablib_data(export_type,
+                                                  self._export_rows(data))
         except (AttributeError, tablib.UnsupportedFormat):
-            flash(lazy_gettext('Export type "%(type)s" is not supported.',
-                               type=export_type), 'error')
+            flash(gettext('Export type "%(type)s" is not supported.',
+                          type=export_type), 'error')
             return redirect(return_url)
 
         return Response(
@@ -1023,7 +2329,155 @@ class ModelView(BaseView):
             mimetype=mimetype,
         )
 
+    def _export_chunks(self, export_type, writer, titles, rows):
+        "Generate the export of `rows` with `writer`, counting its size."
+        metrics = get_metrics()
+        if metrics is None:
+            return writer.generate(titles, rows)
+
+        labels = (('view', self.endpoint), ('format', export_type))
+        rows = metrics.count('plumbum_export_rows_total', labels, rows)
+        return metrics.count('plumbum_export_bytes_total', labels,
+                             writer.generate(titles, rows), size=_chunk_size)
+
+    def _get_tablib_data(self, export_type, rows):
+        "Return the `rows` exported by tablib in `export_type` format."
+        ds = tablib.Dataset(headers=[str(c[1]) for c in self._export_columns])
+
+        for vals in rows:
+            ds.append(vals)
+
+        try:
+            result = ds.export(format=export_type)
+        except AttributeError:
+            result = getattr(ds, export_type)
+
+        metrics = get_metrics()
+        if metrics is not None:
+            labels = (('view', self.endpoint), ('format', export_type))
+            metrics.inc('plumbum_export_rows_total', labels, len(ds))
+            metrics.inc('plumbum_export_bytes_total', labels,
+                        _chunk_size(result))
+
+        return result
+
+    # Background exports
+    def get_export_job_queue(self):
+        if self.export_job_queue is None:
+            self.export_job_queue = get_default_queue(self.plumbum.app)
+        return self.export_job_queue
+
+    def _can_export_async(self):
+        return self.can_export and self.export_async
+
+    def _get_export_job(self, job_id):
+        if not self.can_export:
+            abort(403)
+
+        job = self.get_export_job_queue().get(job_id)
+
+        if job is None or job.endpoint != self.endpoint:
+            abort(404)
+
+        return job
+
+    def _export_job_status(self, job):
+        status = job.to_dict()
+        status['status_url'] = self.get_url('.export_job_status',
+                                            job_id=job.id)
+        if job.status == job.DONE:
+            status['download_url'] = self.get_url('.export_job_download',
+                                                  job_id=job.id)
+        return status
+
+    def _run_export_job(self, environ, job, fileobj):
+        "Write an export in the background, in a copy of the request."
+        writer = self.get_export_writer(job.export_type)
+
+        def rows(data):
+            for vals in self._export_rows(data):
+                yield vals
+                job.add_row()
+
+        with self.plumbum.app.request_context(environ):
+            set_current_view(self)
+
+            count, data = self._export_data()
+            titles = [str(c[1]) for c in self._export_columns]
+
+            if writer is not None:
+                chunks = self._export_chunks(job.export_type, writer, titles,
+                                             rows(data))
+            else:
+                chunks = [self._get_tablib_data(job.export_type, rows(data))]
+
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                fileobj.write(chunk)
+
+    @expose('/export/<export_type>/job/', methods=('POST',))
+    def export_job(self, export_type):
+        "Start a background export, return its status as JSON."
+        if not self.can_export or (export_type not in self.export_types):
+            abort(403)
+
+        if not ExportJobForm().validate_on_submit():
+            return jsonify(error=gettext('Invalid request.')), 400
+
+        if tablib is None and self.get_export_writer(export_type) is None:
+            message = gettext('Tablib dependency not installed')
+            return jsonify(error=message), 400
+
+        # The export reads the list arguments of the query string, the
+        # posted body is not available anymore when it runs
+        environ = dict(request.environ)
+        environ.update({
+            'REQUEST_METHOD': 'GET',
+            'CONTENT_LENGTH': '0',
+            'wsgi.input': BytesIO(),
+        })
+
+        def run(job, fileobj):
+            self._run_export_job(environ, job, fileobj)
+
+        job = self.get_export_job_queue().submit(
+            self.endpoint,
+            export_type,
+            self.get_export_filename(export_type),
+            run,
+        )
+
+        return jsonify(self._export_job_status(job)), 202
+
+    @expose('/export/job/<job_id>/')
+    def export_job_status(self, job_id):
+        "Return the status of a background export as JSON."
+        return jsonify(self._export_job_status(self._get_export_job(job_id)))
+
+    @expose('/export/job/<job_id>/download/')
+    def export_job_download(self, job_id):
+        "Download the file of a finished background export."
+        job = self._get_export_job(job_id)
+
+        if job.status != job.DONE:
+            abort(404)
+
+        writer = self.get_export_writer(job.export_type)
+        if writer is not None:
+            mimetype = writer.mimetype
+        else:
+            mimetype = mimetypes.guess_type(job.filename)[0] or \
+                'application/octet-stream'
+
+        return send_file(job.path, mimetype=mimetype, as_attachment=True,
+                         attachment_filename=secure_filename(job.filename))
+
     def _export_data(self):
+        """
+        Return `(count, rows)` for the export, rows is an iterator and count
+        is always `None`.
+        """
         for col, f in self.column_formatters_export.items():
             # skip checkin columns not being exported
             if col not in [col for col, _ in self._export_columns]:
@@ -1045,11 +2499,26 @@ class ModelView(BaseView):
             sort_column = sort_column[0]
 
         # Get count and data
-        count, data = self.get_list(0, sort_column, view_args.sort_desc,
-                                    view_args.search, view_args.filters,
-                                    page_size=self.export_max_rows)
+        count, query = self.get_list(0, sort_column, view_args.sort_desc,
+                                     view_args.search, view_args.filters,
+                                     page_size=self.export_max_rows,
+                                     execute=False)
 
-        return count, data
+        query = query.options(*self._export_loader_options)
+
+        return count, self._iter_export_rows(query)
+
+    def _iter_export_rows(self, query):
+        """
+        Iterate over the export query in chunks of `export_chunk_size` rows,
+        expunging each row from the session once it has been written.
+        """
+        query = query.execution_options(stream_results=True) \
+                     .yield_per(self.export_chunk_size)
+
+        for row in query:
+            yield row
+            self.session.expunge(row)
 
     def get_export_filename(self, export_type='csv'):
         return "{}_{}.{}".format(
@@ -0,0 +1,29 @@
+import $ from 'jquery';
+
+// Check or uncheck every row of the list
+$(document).on('change', '[data-action-toggle]', (event) => {
+  $('input[name="rowid"]').prop('checked', event.currentTarget.checked);
+});
+
+// Post the action form for the checked rows (or all matching rows)
+$(document).on('click', '[data-action]', (event) => {
+  event.preventDefault();
+
+  const $item = $(event.currentTarget);
+  const $form = $('#action-form');
+  const selectAll = $('[data-action-select-all]').is(':checked');
+
+  if (!selectAll && !$('input[name="rowid"]:checked').length) {
+    window.alert($form.data('empty'));
+    return;
+  }
+
+  const confirmation = $item.data('confirmation');
+  if (confirmation && !window.confirm(confirmation)) {
+    return;
+  }
+
+  $form.find('[name="action"]').val($item.data('action'));
+  $form.find('[name="select_all"]').val(selectAll ? '1' : '');
+  $form.submit();
+});
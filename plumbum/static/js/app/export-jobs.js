@@ -0,0 +1,46 @@
+import $ from 'jquery';
+import axios from 'axios';
+
+const POLL_INTERVAL = 1000;
+
+const setStatus = ($status, text) => {
+  $status.text(text);
+};
+
+const poll = ($status, url) => {
+  axios.get(url).then((response) => {
+    const job = response.data;
+
+    if (job.status === 'done') {
+      setStatus($status, '');
+      window.location = job.download_url;
+    } else if (job.status === 'failed') {
+      setStatus($status, $status.data('failed'));
+    } else {
+      setStatus($status, $status.data('running').replace('__rows__', job.rows));
+      setTimeout(() => poll($status, url), POLL_INTERVAL);
+    }
+  }).catch(() => {
+    setStatus($status, $status.data('failed'));
+  });
+};
+
+// Run exports marked with data-export-job in background and poll status
+$(document).on('click', '[data-export-job]', (event) => {
+  event.preventDefault();
+
+  const $link = $(event.currentTarget);
+  const $status = $link.closest('.list-controls').find('.export-job-status');
+
+  // Starting an export is a POST, protected by the CSRF token
+  const data = new URLSearchParams();
+  if ($status.data('csrfToken')) {
+    data.append('csrf_token', $status.data('csrfToken'));
+  }
+
+  axios.post($link.data('export-job'), data).then((response) => {
+    poll($status, response.data.status_url);
+  }).catch(() => {
+    setStatus($status, $status.data('failed'));
+  });
+});
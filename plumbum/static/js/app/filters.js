@@ -0,0 +1,33 @@
+import $ from 'jquery';
+
+// Next free position for a filter URL argument (flt<position>_<arg>)
+const nextPosition = ($form) => {
+  let position = 0;
+  $form.find('.active-filters [name^="flt"]').each((index, input) => {
+    position = Math.max(position, parseInt(input.name.slice(3), 10) + 1);
+  });
+  return position;
+};
+
+// Add a filter row from its template
+$(document).on('click', '[data-filter-add]', (event) => {
+  event.preventDefault();
+
+  const arg = $(event.currentTarget).data('filter-add');
+  const $form = $('[data-filters-form]');
+  const name = `flt${nextPosition($form)}_${arg}`;
+  const html = $form.find(`[data-filter-template="${arg}"]`).html();
+
+  $form.find('.active-filters').append(html.replace(/__name__/g, name));
+  $form.find('[type="submit"]').prop('hidden', false);
+  $form.find(`[name="${name}"]`).focus();
+});
+
+// Remove a filter row and reload the list without it
+$(document).on('click', '[data-filter-remove]', (event) => {
+  event.preventDefault();
+
+  const $form = $(event.currentTarget).closest('form');
+  $(event.currentTarget).closest('.filter-row').remove();
+  $form.submit();
+});
@@ -4,6 +4,9 @@
 
 import jQuery from 'jquery';
 import './scrolling-tabs';
+import './export-jobs';
+import './filters';
+import './actions';
 
 const $ = jQuery;
 
@@ -14,6 +14,14 @@ def get_current_view():
     return getattr(g, '_plumbum_view', None)
 
 
+def get_request_cache(name):
+    "Return a dictionary named `name` that lives for the current request."
+    caches = getattr(g, '_plumbum_request_cache', None)
+    if caches is None:
+        caches = g._plumbum_request_cache = dict()
+    return caches.setdefault(name, dict())
+
+
 def prettify_class_name(name):
     return sub(r'(?<=.)([A-Z])', r' \1', name)
 